@@ -60,6 +60,7 @@ setup(
         'zope.dottedname',
         'zope.viewlet',
         'nikola >= 8.0.0b2',
+        'importlib_metadata; python_version < "3.8"',
     ],
     extras_require={
         'test': TESTS_REQUIRE,
@@ -68,6 +69,9 @@ setup(
             'repoze.sphinx.autointerface',
             'sphinx_rtd_theme',
         ],
+        'benchmarks': [
+            'pyperf',
+        ],
     },
     # See the thread at https://github.com/pypa/pip/issues/2874#issuecomment-109429489
     # for why we don't try to use data_files.
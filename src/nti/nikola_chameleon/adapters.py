@@ -7,6 +7,11 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+from weakref import WeakKeyDictionary
+from weakref import ref
+
+from nikola.utils import LocaleBorg
+
 from zope import component
 from zope import interface
 from zope.traversing.interfaces import ITraversable
@@ -14,26 +19,80 @@ from zope.traversing.interfaces import IPathAdapter
 
 from .interfaces import IPost
 
+#: {post: {adapter class: adapter}} for the posts traversed with a
+#: path adapter since the site was last scanned. See :func:`clear`.
+_POST_ADAPTERS = WeakKeyDictionary()
+
+
+def clear():
+    """
+    Forget the post path adapters and the values they found.
+
+    :class:`~.ChameleonTemplates` does this each time the site is
+    scanned.
+
+    .. versionadded:: 1.0.1
+    """
+    _POST_ADAPTERS.clear()
+
+
+def _post_adapter(cls, post):
+    adapters = _POST_ADAPTERS.get(post)
+    if adapters is None:
+        adapters = _POST_ADAPTERS[post] = {}
+    adapter = adapters.get(cls)
+    if adapter is None:
+        adapter = adapters[cls] = cls(post)
+    return adapter
+
+
+class _PostPathAdapter(object):
+    # Keeps the value found for each language and name.
+
+    #: ``_lookup(post, name)`` finds the value of *name* for *post*
+    #: in the current language.
+    _lookup = None
+
+    def __init__(self, context):
+        # Weakly, so that _POST_ADAPTERS doesn't keep the post alive.
+        self._context = ref(context)
+        # {(lang, name): value}
+        self._values = {}
+
+    @property
+    def context(self):
+        return self._context()
+
+    def traverse(self, name, furtherPath):
+        key = (LocaleBorg().current_lang, name)
+        values = self._values
+        try:
+            return values[key]
+        except KeyError:
+            value = values[key] = self._lookup(self._context(), name)
+            return value
+
+
 @interface.implementer(IPathAdapter, ITraversable)
 @component.adapter(IPost)
-class MetaPathAdapter(object):
+class MetaPathAdapter(_PostPathAdapter):
     """
     Lets us access the meta object in path
     expressions.
 
     ``post/meta:link`` ``post/meta:keywords``
-    """
 
-    def __init__(self, context):
-        self.context = context
+    .. versionchanged:: 1.0.1
+       Keeps the value of each meta key in each language. Registered
+       through :func:`meta_path_adapter`.
+    """
 
-    def traverse(self, name, furtherPath):
-        return self.context.meta(name)
+    _lookup = staticmethod(lambda post, name: post.meta(name))
 
 
 @interface.implementer(IPathAdapter, ITraversable)
 @component.adapter(IPost)
-class FormattedDatePathAdapter(object):
+class FormattedDatePathAdapter(_PostPathAdapter):
     """
     Lets us access the formatted date function
     in tales expressions.
@@ -41,10 +100,38 @@ class FormattedDatePathAdapter(object):
     ``post/formatted_date:webiso`` ``post/formatted_date:?date_format``
 
     .. versionadded:: 0.0.1a2
+    .. versionchanged:: 1.0.1
+       Keeps the date in each format and language. Registered through
+       :func:`formatted_date_path_adapter`.
     """
 
-    def __init__(self, context):
-        self.context = context
+    _lookup = staticmethod(lambda post, name: post.formatted_date(name))
 
-    def traverse(self, name, furtherPath):
-        return self.context.formatted_date(name)
+
+def meta_path_adapter(post):
+    """
+    The ``meta`` path adapter: the :class:`MetaPathAdapter` for
+    *post*, which is reused until the site is scanned again.
+
+    .. versionadded:: 1.0.1
+    """
+    return _post_adapter(MetaPathAdapter, post)
+
+
+def formatted_date_path_adapter(post):
+    """
+    The ``formatted_date`` path adapter: the
+    :class:`FormattedDatePathAdapter` for *post*, which is reused until
+    the site is scanned again.
+
+    .. versionadded:: 1.0.1
+    """
+    return _post_adapter(FormattedDatePathAdapter, post)
+
+
+try:
+    from zope.testing import cleanup
+except ImportError: # pragma: no cover
+    pass
+else:
+    cleanup.addCleanUp(clear)
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Management of the compiled template cache.
+
+Chameleon compiles each template into a Python module and can keep
+those modules in a directory so that they don't have to be compiled
+again. The key it uses includes the full path of the template, so
+checking out a theme into a new directory (as CI systems do) compiles
+everything again; the directory also grows without limit as templates
+change.
+
+Here we key compiled templates on the template's contents and the
+versions of the software that compiles them (see
+:func:`template_digest`), and keep the directory to a maximum size by
+removing the least recently used modules. Templates sharing a module
+still report errors with their own file name (see
+:meth:`.NikolaPageFileTemplate._cook`).
+
+.. versionadded:: 1.0.1
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from hashlib import sha256
+import os
+import os.path
+import time
+
+from chameleon.loader import ModuleLoader
+
+try:
+    from importlib.metadata import PackageNotFoundError
+    from importlib.metadata import version as distribution_version
+except ImportError: # pragma: no cover
+    # Python < 3.8
+    from importlib_metadata import PackageNotFoundError
+    from importlib_metadata import version as distribution_version
+
+logger = __import__('logging').getLogger(__name__)
+
+#: The default maximum size, in bytes, of the compiled template cache.
+DEFAULT_MAX_SIZE = 50 * 1024 * 1024
+
+#: The distributions whose versions affect compiled templates.
+VERSIONED_DISTRIBUTIONS = ('Chameleon', 'z3c.pt', 'nti.nikola_chameleon')
+
+
+def _versions_digest():
+    digest = sha256()
+    for name in VERSIONED_DISTRIBUTIONS:
+        try:
+            version = distribution_version(name)
+        except PackageNotFoundError: # pragma: no cover
+            # Running from a checkout
+            version = 'unknown'
+        digest.update(('%s=%s;' % (name, version)).encode('utf-8'))
+    return digest
+
+_VERSIONS_DIGEST = _versions_digest()
+
+
+def template_digest(template, body, names):
+    """
+    Return the digest that identifies the compiled form of *template*.
+
+    This depends on the *body* (source) of the template, the *names*
+    of its builtins, its expression types, the settings that change how it is compiled, and
+    the versions of the :data:`VERSIONED_DISTRIBUTIONS`. Unlike
+    Chameleon's own digest, it does not depend on where the template
+    file is.
+    """
+    digest = _VERSIONS_DIGEST.copy()
+    digest.update(type(template).__name__.encode('utf-8'))
+    digest.update(body.encode('utf-8', 'ignore'))
+    digest.update(';'.join(names).encode('utf-8'))
+    # The functions expressions call are imported by the compiled code.
+    for name, factory in sorted(template.expression_types.items()):
+        factory = getattr(factory, 'func', factory) # functools.partial
+        digest.update((";%s=%s.%s" % (name, factory.__module__, factory.__name__)).encode('ascii'))
+    for attr in ('trim_attribute_space',
+                 'implicit_i18n_translate',
+                 'strict'):
+        digest.update((";%s=%s" % (attr, getattr(template, attr, None))).encode('ascii'))
+    return digest.hexdigest()[:32]
+
+
+class CompiledTemplateCache(ModuleLoader):
+    """
+    A Chameleon module loader that keeps compiled templates in the
+    directory *path*.
+
+    Each time a module is used its access time is updated. After a new
+    module is written, if the directory holds more than *max_size*
+    bytes, the least recently used modules are removed until it
+    doesn't (modules used by this process are never removed).
+    """
+
+    def __init__(self, path, max_size=DEFAULT_MAX_SIZE):
+        ModuleLoader.__init__(self, path, remove=False)
+        self.max_size = max_size
+        self._used = set()
+
+    def get(self, filename):
+        result = ModuleLoader.get(self, filename)
+        if result is not None:
+            self._used.add(os.path.splitext(filename)[0])
+            path = os.path.join(self.path, filename)
+            try:
+                # Only the access time. Changing the modification time
+                # would invalidate the byte code.
+                os.utime(path, (time.time(), os.stat(path).st_mtime))
+            except OSError: # pragma: no cover
+                pass
+        return result
+
+    def build(self, source, filename):
+        result = ModuleLoader.build(self, source, filename)
+        self._used.add(os.path.splitext(filename)[0])
+        self.evict()
+        return result
+
+    def _entries(self):
+        # {module name: [atime, size, [paths]]}
+        entries = {}
+
+        def add(base, path, is_source):
+            try:
+                stat = os.stat(path)
+            except OSError: # pragma: no cover
+                return
+            entry = entries.setdefault(base, [0, 0, []])
+            if is_source:
+                entry[0] = stat.st_atime
+            entry[1] += stat.st_size
+            entry[2].append(path)
+
+        for name in os.listdir(self.path):
+            base, ext = os.path.splitext(name)
+            if ext == '.py':
+                add(base, os.path.join(self.path, name), True)
+
+        pycache = os.path.join(self.path, '__pycache__')
+        if os.path.isdir(pycache):
+            for name in os.listdir(pycache):
+                # name.cpython-36.pyc
+                add(name.split('.', 1)[0], os.path.join(pycache, name), False)
+        return entries
+
+    def evict(self):
+        """
+        Remove the least recently used modules until the cache is no
+        larger than ``max_size``.
+
+        Returns the names of the modules removed.
+        """
+        entries = self._entries()
+        total = sum(entry[1] for entry in entries.values())
+        removed = []
+        if total <= self.max_size:
+            return removed
+
+        # Byte code without source sorts first.
+        for base, (_, size, paths) in sorted(entries.items(), key=lambda i: i[1][0]):
+            if total <= self.max_size:
+                break
+            if base in self._used:
+                continue
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError: # pragma: no cover
+                    pass
+            total -= size
+            removed.append(base)
+        logger.debug("Removed %d compiled templates from %s", len(removed), self.path)
+        return removed
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Recording the files used to render templates.
+
+Which files a template depends on can't be known from its source:
+macros, traversal (``@@base.tmpl``) and viewlets are all found
+through the component registry, and which ones are used depends on
+what is being rendered. So instead we record each template file that
+is rendered or has its macros used while a template is being
+rendered (see :func:`recording`), and remember that in a
+:class:`DependencyGraph` for the next build.
+
+.. versionadded:: 1.0.1
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from contextlib import contextmanager
+import json
+import os
+import os.path
+import tempfile
+
+try:
+    import fcntl
+except ImportError: # pragma: no cover
+    # Windows.
+    fcntl = None
+
+logger = __import__('logging').getLogger(__name__)
+
+#: The sets of files being recorded, outermost first.
+_RECORDING = []
+
+
+def record(filename):
+    """
+    Note that *filename* was used by everything being recorded.
+    """
+    for files in _RECORDING:
+        files.add(filename)
+
+
+@contextmanager
+def recording():
+    """
+    A context manager that records the files used while it is
+    active.
+
+    It produces the set of file names; recordings can be nested, and
+    the files used by an inner recording are also part of the outer
+    recordings.
+    """
+    files = set()
+    _RECORDING.append(files)
+    try:
+        yield files
+    finally:
+        _RECORDING.pop()
+
+
+@contextmanager
+def exclusive_lock(path):
+    """
+    A context manager that holds an exclusive lock on the file
+    ``path + '.lock'`` (which is created if needed) while it is
+    active, so that only one process at a time changes the file
+    *path*.
+
+    Where :mod:`fcntl` isn't available, this does nothing.
+    """
+    if fcntl is None: # pragma: no cover
+        yield
+        return
+    with open(path + '.lock', 'a') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class DependencyGraph(object):
+    """
+    The files each template name has used to render, kept in the JSON
+    file at *path* (if given).
+
+    Files are only ever added; a file that no longer exists is left out
+    of the dependencies. Each change is written immediately, merged with
+    what other processes have written. So that processes building at
+    the same time (``nikola build -n N``) don't replace each other's
+    changes, the file is read and written while holding an exclusive
+    lock on ``path + '.lock'`` (where :mod:`fcntl` is available).
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._files = {}
+        if path is not None:
+            self._files = self._read()
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+        return {name: set(files) for name, files in data.items()}
+
+    def add(self, name, files):
+        """
+        Record that the template *name* used the *files*.
+        """
+        known = self._files.setdefault(name, set())
+        if files.issubset(known):
+            return
+        known.update(files)
+        self.save()
+
+    def get(self, name):
+        """
+        Return the sorted list of existing files the template *name*
+        has used.
+        """
+        return sorted(f for f in self._files.get(name, ()) if os.path.exists(f))
+
+    def save(self):
+        if self.path is None:
+            return
+        try:
+            with exclusive_lock(self.path):
+                self._save()
+        except (IOError, OSError): # pragma: no cover
+            logger.exception("Failed to lock dependencies in %s", self.path)
+
+    def _save(self):
+        files = self._read()
+        for name, names_files in self._files.items():
+            files.setdefault(name, set()).update(names_files)
+        self._files = files
+
+        directory = os.path.dirname(self.path)
+        fd, temp = tempfile.mkstemp(prefix='.deps', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({name: sorted(names_files) for name, names_files in files.items()},
+                          f, indent=1, sort_keys=True)
+            os.rename(temp, self.path)
+        except (IOError, OSError): # pragma: no cover
+            logger.exception("Failed to save dependencies to %s", self.path)
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
@@ -9,7 +9,6 @@ from __future__ import print_function
 
 # stdlib imports
 
-from z3c.pt.pagetemplate import ViewPageTemplate
 from zope import interface
 
 from zope.publisher.interfaces.browser import IDefaultBrowserLayer
@@ -17,6 +16,62 @@ from zope.viewlet.viewlet import ViewletBase
 
 from .view import BaseView
 
+# The feed links are rendered from these fragments, filled in with
+# escaped values the way Chameleon would render the equivalent
+# templates. They depend on nothing else, so each link is only
+# rendered once per build; see ChameleonTemplates.feed_links.
+
+_HEAD_FEED_LINK = (u'\n    <link rel="alternate" type="{link_type}"'
+                   u' title="{link_name}" hreflang="{language}"'
+                   u' href="{href}">\n    ')
+
+_HTML_FEED_LINK = (u'\n    <a type="{link_type}"'
+                   u' title="{link_name}" hreflang="{language}"'
+                   u' href="{href}" >\n'
+                   u'    {text}\n'
+                   u'    </a>\n    ')
+
+
+def _escape(value, quote=False):
+    # As Chameleon escapes the value of ``${...}`` in text, or, if
+    # *quote*, in an attribute.
+    if value is None:
+        return u''
+    html = getattr(value, '__html__', None)
+    if html is not None:
+        return html()
+    value = str(value)
+    if '&' in value:
+        value = value.replace('&', '&amp;')
+    if '<' in value:
+        value = value.replace('<', '&lt;')
+    if '>' in value:
+        value = value.replace('>', '&gt;')
+    if quote and '"' in value:
+        value = value.replace('"', '&quot;')
+    return value
+
+
+def _feed_link(options, fragment, link_type, link_name, link_postfix,
+               classification, kind, language, extra=None):
+    view = options.get('view')
+    templates = getattr(view, 'templates', None)
+    links = templates.feed_links if templates is not None else {}
+    key = (fragment, link_type, link_name, link_postfix, classification, kind, language, extra)
+    link = links.get(key)
+    if link is None:
+        href = options['_link'](kind + '_' + link_postfix, classification, language)
+        text = u''
+        if extra is not None:
+            text = _escape(options['messages'](link_name, language)) + _escape(extra)
+        link = links[key] = fragment.format(link_type=_escape(link_type, True),
+                                            link_name=_escape(link_name, True),
+                                            language=_escape(language, True),
+                                            href=_escape(href, True),
+                                            text=text)
+    return link
+
+
 @interface.implementer(IDefaultBrowserLayer)
 class Feeds(BaseView):
     "Helpers for feeds."
@@ -28,29 +83,19 @@ class Feeds(BaseView):
     def options(self):
         return self.request.options
 
-    _head_feed_link_tmpl = ViewPageTemplate("""
-    <link tal:define="_link nocall:options/_link"
-          rel="alternate" type="${options/link_type}"
-          title="${options/link_name}" hreflang="${options/language}"
-          href="${python:_link(options['kind'] + '_' + options['link_postfix'], options['classification'], options['language'])}">
-    """)
-
     def _head_feed_link(self, link_type, link_name, link_postfix, classification, kind, language):
         if len(self.options['translations']) > 1:
             raise NotImplementedError("Translations not supported")
 
-        context = dict(self.options)
-        context.update(locals())
-        context.pop('self')
-        # Bind the old 'view' object (really a ChameleonTemplates)
-        # to view again.
-        return self._head_feed_link_tmpl(request=self.request, **context)
+        return _feed_link(self.options, _HEAD_FEED_LINK,
+                          link_type, link_name, link_postfix,
+                          classification, kind, language)
 
     def _feed_head_rss(self, classification=None, kind='index', rss_override=True):
         options = self.options
-        result = u''
+        links = []
         if options['rss_link'] and rss_override:
-            result = options['rss_link']
+            links.append(options['rss_link'])
 
         if (options['generate_rss']
                 and not (options['rss_link'] and rss_override)
@@ -59,37 +104,37 @@ class Feeds(BaseView):
                 raise NotImplementedError("Translations not supported")
             for language in sorted(options['translations']):
                 if (classification or classification == '') and kind != 'index':
-                    result += self._head_feed_link(
+                    links.append(self._head_feed_link(
                         'application/rss+xml',
                         'RSS for ' + kind + ' ' + classification,
                         'rss',
                         classification,
                         kind,
-                        language)
+                        language))
                 else:
-                    result += self._head_feed_link('application/rss+xml',
-                                                   'RSS',
-                                                   'rss',
-                                                   classification,
-                                                   'index',
-                                                   language)
-        return result
+                    links.append(self._head_feed_link('application/rss+xml',
+                                                      'RSS',
+                                                      'rss',
+                                                      classification,
+                                                      'index',
+                                                      language))
+        return u''.join(links)
 
     def _feed_head_atom(self, classification=None, kind='index'):
-        result = u''
+        links = []
         if self.options['generate_atom']:
             for language in sorted(self.options['translations']):
                 if (classification or classification == '') and kind != 'index':
-                    result += self._head_feed_link(
+                    links.append(self._head_feed_link(
                         'application/atom+xml',
                         'Atom for ' + kind + ' ' + classification, 'atom',
                         classification,
                         kind,
-                        language)
+                        language))
                 else:
-                    result += self._head_feed_link('application/atom+xml', 'Atom', 'atom',
-                                                   classification, 'index', language)
-        return result
+                    links.append(self._head_feed_link('application/atom+xml', 'Atom', 'atom',
+                                                      classification, 'index', language))
+        return u''.join(links)
 
     def feed_translations_head(self, classification=None, kind='index',
                                feeds=True, other=True, rss_override=True,
@@ -143,33 +188,15 @@ class HTMLFeedLinkViewlet(ViewletBase):
         if generate_atom or generate_rss:
             self.available = True
 
-    _html_feed_link_tmpl = ViewPageTemplate("""
-    <a tal:define="_link nocall:options/_link;
-                   messages nocall:options/messages;
-                   language options/language;
-                   link_name options/link_name;"
-          type="${options/link_type}"
-          title="${link_name}" hreflang="${language}"
-          href="${python:_link(options['kind'] + '_' + options['link_postfix'], options['classification'], language)}"
-    >
-    ${python:messages(link_name, language)}${options/extra}
-    </a>
-    """)
-
     def _html_feed_link(self, link_type, link_name, link_postfix, classification, kind, language,
                         name=None):
         # Elide translations
-        context = dict(self.request.options)
-        context.update(locals())
-        context.pop('self')
-
         extra = u''
         if name and kind != "archive" and kind != "author":
             extra = " (" + name + ")"
-        # Bind the old 'view' object (really a ChameleonTemplates)
-        # to view again.
-        return self._html_feed_link_tmpl(request=self.request, extra=extra, **context)
-
+        return _feed_link(self.request.options, _HTML_FEED_LINK,
+                          link_type, link_name, link_postfix,
+                          classification, kind, language, extra)
 
     def render(self):
         options = self.request.options
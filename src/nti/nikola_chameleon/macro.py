@@ -7,24 +7,133 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+from weakref import WeakValueDictionary
 
-from z3c.macro.tales import get_macro_template
+from chameleon.astutil import Static
+from chameleon.astutil import Symbol
+from chameleon.codegen import template as codegen_template
+from z3c.macro.interfaces import IMacroTemplate
+import z3c.macro.tales
+import z3c.macro.zcml
+from z3c.pt.pagetemplate import BaseTemplate
 
+from zope import component
 from zope import interface
 
 from zope.traversing.interfaces import ITraversable
 
+from .dependencies import record
+from . import profiling
+from .template import FactoryCache
+from .template import NikolaPageFileTemplate
+
+#: {(path, content_type): template} for the macro files in use.
+#: See :func:`macro_template`.
+_MACRO_TEMPLATES = WeakValueDictionary()
+
+
+def macro_template(path, content_type='text/html'):
+    """
+    Return the :class:`.NikolaPageFileTemplate` for the macro file *path*.
+
+    All the callers asking for the same file while it is in use get
+    the same template, so the file is only read, parsed and compiled
+    once no matter how many macros it defines.
+
+    .. versionadded:: 1.0.1
+    """
+    key = (path, content_type)
+    template = _MACRO_TEMPLATES.get(key)
+    if template is None:
+        template = NikolaPageFileTemplate(path, content_type=content_type)
+        _MACRO_TEMPLATES[key] = template
+    return template
+
+
+class MacroFactory(z3c.macro.zcml.MacroFactory):
+    """
+    A macro factory that shares one template per macro file.
+
+    The z3c.macro factory creates (and reads and checks) a new
+    template each time the macro is looked up. This also keeps the
+    macro it found, unless the template may need to be reloaded.
+
+    .. versionadded:: 1.0.1
+    """
+
+    _macro = None
+
+    def __init__(self, path, macro, contentType):
+        super(MacroFactory, self).__init__(path, macro, contentType)
+        self.template = macro_template(path, contentType)
+
+    def __call__(self, context, view, request):
+        template = self.template
+        macro = self._macro
+        if macro is None or template.auto_reload:
+            macro = self._macro = template.macros[self.macro]
+        else:
+            # As the template's macros would.
+            record(template.filename)
+        return macro
+
+# For the z3c:macro ZCML directive.
+z3c.macro.zcml.MacroFactory = MacroFactory
+
+#: The cache used by :func:`get_macro`. Its ``hits`` and
+#: ``misses`` attributes count how it is used.
+#:
+#: .. versionadded:: 1.0.1
+MACRO_FACTORIES = FactoryCache(IMacroTemplate)
+
+
+def get_macro(context, view, request, name):
+    """
+    Return the macro registered with z3c.macro as *name* for the
+    *context*, *view* and *request*, or raise a
+    ``ComponentLookupError``.
+
+    Like :func:`z3c.macro.tales.get_macro_template`, but the lookup is
+    cached in :data:`MACRO_FACTORIES`.
+
+    .. versionadded:: 1.0.1
+    """
+    macro = MACRO_FACTORIES.query(name, context, view, request)
+    if macro is None:
+        raise component.ComponentLookupError((context, view, request), IMacroTemplate, name)
+    return macro
+
+
+class _MacroGetter(object):
+
+    def __call__(self, context, request, view, name):
+        return get_macro(context, view, request, name)
+
+
+class MacroExpr(z3c.macro.tales.MacroExpr):
+    """
+    The ``macro:`` expression type used by our templates, which
+    finds macros with :func:`get_macro`.
+
+    .. versionadded:: 1.0.1
+    """
+    traverser = Static(codegen_template("cls()", cls=Symbol(_MacroGetter), mode="eval"))
+
+BaseTemplate.expression_types['macro'] = MacroExpr
+
 
 class BoundMacro(object):
 
-    def __init__(self, context, func):
+    def __init__(self, context, func, name=None):
         self.context = context
         self.func = func
+        self.name = name
 
     def include(self, stream, econtext, *args, **kwargs):
         # This is a copy
         econtext['context'] = self.context
-        return self.func.include(stream, econtext, *args, **kwargs)
+        return profiling.call('macro', self.name, self.func.include,
+                              stream, econtext, *args, **kwargs)
 
 @interface.implementer(ITraversable)
 class NamedMacroView(object):
@@ -45,9 +154,21 @@ class NamedMacroView(object):
     def traverse(self, name, ignored):
         view = self.request.options['view']
         templates = view.templates
+        # The macro found doesn't depend on the context object, only
+        # what it provides, so the same one can be bound to each
+        # context.
         return BoundMacro(self.context,
-                          get_macro_template(self.context,
-                                             templates.new_view_for_context(self.context,
-                                                                            self.request),
-                                             self.request,
-                                             name))
+                          get_macro(self.context,
+                                    templates.view_for_context(self.context,
+                                                               self.request),
+                                    self.request,
+                                    name),
+                          name)
+
+
+try:
+    from zope.testing import cleanup
+except ImportError: # pragma: no cover
+    pass
+else:
+    cleanup.addCleanUp(MACRO_FACTORIES.clear)
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+Avoiding rewriting output files that haven't changed.
+
+Rewriting a file with the same contents still changes its
+modification time, which makes tools like rsync (and anything
+invalidating a CDN) treat it as changed. :func:`write_if_changed`
+writes the rendered output to a temporary file, computing its digest
+as it goes, and only replaces the output file if the digest differs
+from the one recorded (in an :class:`OutputDigests` manifest) when the
+output was last written.
+
+This only applies to pages rendered with
+:meth:`.ChameleonTemplates.render_template_to_file`. Nikola 8 renders
+its own pages to strings and writes them itself, rewriting each file,
+so a normal ``nikola build`` doesn't benefit.
+
+.. versionadded:: 1.0.1
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import hashlib
+import io
+import os
+import os.path
+import tempfile
+
+from .dependencies import exclusive_lock
+
+logger = __import__('logging').getLogger(__name__)
+
+
+class OutputDigests(object):
+    """
+    The digest of each output file as it was last written, kept in the
+    file at *path* (if given).
+
+    So that recording each of thousands of files is cheap, and safe
+    for several processes at once, the file is a log: each change
+    appends a line, and later lines replace earlier ones. The file is
+    compacted when it is read if it has many replaced lines. Appending
+    and compacting hold the :func:`.exclusive_lock` of the file, so
+    compacting doesn't lose lines other processes append.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._digests = {}
+        if path is not None:
+            lines = self._read()
+            if len(lines) > 2 * len(self._digests) + 100:
+                try:
+                    with exclusive_lock(path):
+                        # Including anything appended since.
+                        self._read()
+                        self._compact()
+                except (IOError, OSError): # pragma: no cover
+                    logger.exception("Failed to lock %s", path)
+
+    def _read(self):
+        try:
+            with io.open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        except (IOError, OSError):
+            return []
+        for line in lines:
+            if not line.endswith('\n'):
+                # Incompletely written
+                continue
+            try:
+                digest, size, mtime, filename = line[:-1].split(' ', 3)
+                self._digests[filename] = (digest, int(size), int(mtime))
+            except ValueError:
+                continue
+        return lines
+
+    def _compact(self):
+        fd, temp = tempfile.mkstemp(prefix='.digests', dir=os.path.dirname(self.path))
+        try:
+            with io.open(fd, 'w', encoding='utf-8') as f:
+                for filename, entry in sorted(self._digests.items()):
+                    f.write(self._format(filename, entry))
+            os.rename(temp, self.path)
+        except (IOError, OSError): # pragma: no cover
+            logger.exception("Failed to compact %s", self.path)
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _format(filename, entry):
+        return u'%s %d %d %s\n' % (entry + (filename,))
+
+    def unchanged(self, filename, digest):
+        """
+        Is the file *filename* as we last wrote it, with the contents
+        whose digest is *digest*?
+        """
+        entry = self._digests.get(filename)
+        if entry is None or entry[0] != digest:
+            return False
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return False
+        return (stat.st_size, stat.st_mtime_ns) == entry[1:]
+
+    def set(self, filename, digest):
+        """
+        Record that we have just written the file *filename* with
+        contents whose digest is *digest*.
+        """
+        stat = os.stat(filename)
+        entry = self._digests[filename] = (digest, stat.st_size, stat.st_mtime_ns)
+        if self.path is None:
+            return
+        try:
+            with exclusive_lock(self.path):
+                with io.open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(self._format(filename, entry))
+        except (IOError, OSError): # pragma: no cover
+            logger.exception("Failed to save output digest to %s", self.path)
+
+
+class _HashingWriter(io.RawIOBase):
+    # Computes the digest of the bytes written to the raw file.
+
+    def __init__(self, raw):
+        io.RawIOBase.__init__(self)
+        self._raw = raw
+        self.hash = hashlib.sha1()
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        written = self._raw.write(b)
+        self.hash.update(memoryview(b)[:written])
+        return written
+
+    def close(self):
+        try:
+            self._raw.close()
+        finally:
+            io.RawIOBase.close(self)
+
+
+def _umask():
+    # Only possible by changing it, so this is done once, on import,
+    # not while other threads may be creating files.
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+#: What mode a new output file gets; mkstemp doesn't use the umask.
+_FILE_MODE = 0o666 & ~_umask()
+
+
+def write_if_changed(filename, digests, write):
+    """
+    Call *write* with a UTF-8 text file to write the new contents of
+    *filename* to, and replace *filename* with what it wrote, unless
+    *digests* (an :class:`OutputDigests`) shows that *filename*
+    already has exactly those contents.
+
+    If *write* raises an exception, *filename* is left alone.
+
+    :return: Whether *filename* was written.
+    """
+    fd, temp = tempfile.mkstemp(prefix='.' + os.path.basename(filename),
+                                dir=os.path.dirname(filename))
+    try:
+        raw = _HashingWriter(io.FileIO(fd, 'w'))
+        with io.TextIOWrapper(io.BufferedWriter(raw), encoding='utf-8', newline='') as f:
+            write(f)
+        digest = raw.hash.hexdigest()
+        if digests.unchanged(filename, digest):
+            os.remove(temp)
+            return False
+        if os.path.exists(filename):
+            os.chmod(temp, os.stat(filename).st_mode & 0o7777)
+        else:
+            os.chmod(temp, _FILE_MODE)
+        os.replace(temp, filename)
+    except BaseException:
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+        raise
+    digests.set(filename, digest)
+    return True
@@ -9,17 +9,22 @@ from __future__ import print_function
 
 # stdlib imports
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import atexit
+import gc
 import glob
+import io
 import os
 import os.path
+from weakref import WeakKeyDictionary
 
+from blinker import signal
 
 from nikola.plugin_categories import TemplateSystem
+from nikola.utils import LocaleBorg
 from nikola.utils import makedirs
 from z3c.macro.interfaces import IMacroTemplate
 
-from z3c.macro.zcml import MacroFactory
-
 from z3c.template.interfaces import IContentTemplate
 
 from zope import component
@@ -32,12 +37,27 @@ from zope.dottedname import resolve as dottedname
 from zope.proxy.decorator import SpecificationDecoratorBase
 
 import nti.nikola_chameleon
+from nti.nikola_chameleon import adapters
 from nti.nikola_chameleon import interfaces
-from .request import Request
-
-from .template import NikolaPageFileTemplate
+from .cache import CompiledTemplateCache
+from .cache import DEFAULT_MAX_SIZE
+from .dependencies import DependencyGraph
+from .dependencies import recording
+from .macro import MACRO_FACTORIES
+from .macro import MacroFactory
+from .macro import macro_template
+from .outputs import OutputDigests
+from .outputs import write_if_changed
+from . import profiling
+from .request import request_factory
+
+from .template import FactoryCache
+from .template import TemplateCompilation
 from .template import TemplateFactory
-from .view import View
+from .template import compile_templates
+from .view import DEFAULT_TEXT_CACHE_MAX_SIZE
+from .view import TextCache
+from .view import view_factory
 
 logger = __import__('logging').getLogger(__name__)
 
@@ -59,29 +79,39 @@ class _MathJaxPostListContext(_PostListContext):
     MathJax in one of the posts.
     """
 
-class _OptionsProxy(object):
+class _OptionsContext(object):
+    """
+    Instances of the subclasses made by :func:`_options_context`
+    are the context of pages that are about the items of the options
+    dictionary, not a post.
+    """
 
-    _properties = ()
+    __slots__ = ('options',)
 
     def __init__(self, options):
         self.options = options
 
-    def __getattr__(self, name):
-        if name not in self._properties:
-            raise AttributeError(name)
-        return self.options[name]
+def _option(name):
+    return property(lambda self: self.options[name])
+
+def _options_context(classname, iface):
+    # A subclass of _OptionsContext implementing *iface*, with a
+    # property for each of its attributes.
+    attrs = {name: _option(name) for name in iface.names(all=True)}
+    attrs['__module__'] = __name__
+    attrs['__slots__'] = ()
+    cls = type(classname, (_OptionsContext,), attrs)
+    interface.classImplements(cls, iface)
+    return cls
 
-@interface.implementer(interfaces.IListing)
-class _ListingContext(_OptionsProxy):
-    _properties = tuple(interfaces.IListing.names())
+_ListingContext = _options_context('_ListingContext', interfaces.IListing)
+_GalleryContext = _options_context('_GalleryContext', interfaces.IGallery)
+_SlideContext = _options_context('_SlideContext', interfaces.ISlide)
 
-@interface.implementer(interfaces.IGallery)
-class _GalleryContext(_OptionsProxy):
-    _properties = tuple(interfaces.IGallery.names())
+#: The cache used by :func:`getViewTemplate`. Its ``hits`` and
+#: ``misses`` attributes count how it is used.
+TEMPLATE_FACTORIES = FactoryCache(IContentTemplate)
 
-@interface.implementer(interfaces.ISlide)
-class _SlideContext(_OptionsProxy):
-    _properties = tuple(interfaces.ISlide.names())
 
 def getViewTemplate(name, view, request, context):
     """
@@ -91,26 +121,25 @@ def getViewTemplate(name, view, request, context):
     If no such template is found, drop the *context* and try to find
     a template just for the *view* and *request*.
     """
-    template = component.queryMultiAdapter(
-        (view, request, context),
-        IContentTemplate, name=name)
+    template = TEMPLATE_FACTORIES.query(name, view, request, context)
     if template is None:
-        template = component.getMultiAdapter(
-            (view, request),
-            IContentTemplate, name=name)
+        template = TEMPLATE_FACTORIES.query(name, view, request)
+        if template is None:
+            raise component.ComponentLookupError((view, request), IContentTemplate, name)
 
     return template
 
+def _is_template_name(name):
+    # As opposed to the contents of a template string.
+    return name.endswith('.tmpl') and '\n' not in name
+
+
 class ChameleonTemplates(TemplateSystem):
     """
     An implementation of the TemplateSystem plugin using Chameleon
     and zope.component.
     """
 
-    # pylint:disable=abstract-method
-    # get_deps, get_string_deps, and get_template_path
-    # don't seem to be called? Leave them as unimplemented.
-
 
     name = 'nti.nikola_chameleon'
 
@@ -121,6 +150,235 @@ class ChameleonTemplates(TemplateSystem):
         self._template_paths = []
         # The (one) directory we check for shortcodes
         self._shortcode_paths = ['shortcodes']
+        # The featured posts, computed once per scan of the site.
+        # This is a tuple (posts, len(posts), featured); see
+        # featured_posts.
+        self._featured = None
+        # Which of the site's posts have math, computed once per scan
+        # of the site. This is a tuple (posts, len(posts), {post:
+        # position}, {lang: bitset}); see _posts_have_math.
+        self._math = None
+        # {post: {lang: providedBy(post)}} for posts we have used
+        # as the context. See _provide_post_markers.
+        self._post_specs = WeakKeyDictionary()
+        # Whether prepare_for_workers has frozen the garbage collector.
+        self._gc_frozen = False
+        # The TemplateCompilation and its executor started by precompile()
+        self._compilation = None
+        self._compile_executor = None
+        #: A dictionary from template file name to the number of
+        #: seconds spent compiling it in :meth:`precompile`.
+        self.compile_times = {}
+        # The files each template name used the last time(s) it was
+        # rendered; see template_deps. This is kept in the cache folder.
+        self._dependencies = DependencyGraph()
+        # The theme.zcml files we have loaded, which can change
+        # anything.
+        self._theme_files = []
+        # {contents: TemplateFactory} for the shortcode templates,
+        # which Nikola identifies by their contents. These are kept out
+        # of the component registry (and TEMPLATE_FACTORIES) so we
+        # don't hash and compare the contents in each of its lookups;
+        # the hash of each string is computed once and cached by Python.
+        self._shortcode_templates = {}
+        # The digests of the output files we have written, so we
+        # don't rewrite them with the same contents. This is kept in
+        # the cache folder.
+        self._output_digests = OutputDigests()
+        self._cache_folder = None
+        #: The feed links rendered by :mod:`.feeds` since the site was
+        #: last scanned, keyed by everything they depend on.
+        self.feed_links = {}
+        #: The :class:`.TextCache` of the text of the posts used by
+        #: ``@@post_text`` since the site was last scanned.
+        self.post_texts = TextCache()
+
+    def set_site(self, site):
+        super(ChameleonTemplates, self).set_site(site)
+        loader = dottedname.resolve('chameleon.template.BaseTemplate').loader
+        if isinstance(loader, CompiledTemplateCache):
+            loader.max_size = site.config.get('CHAMELEON_CACHE_MAX_SIZE',
+                                              DEFAULT_MAX_SIZE)
+        self.post_texts.max_size = site.config.get('CHAMELEON_TEXT_CACHE_MAX_SIZE',
+                                                   DEFAULT_TEXT_CACHE_MAX_SIZE)
+        # Nikola sends this each time it (re)scans the posts, which is
+        # the only time that a post's status can change.
+        signal('scanned').connect(self._site_scanned)
+        if site.config.get('CHAMELEON_PRECOMPILE'):
+            # The site hasn't been scanned yet; compile while it is.
+            self.precompile()
+        if site.config.get('CHAMELEON_PROFILE'):
+            self.start_profiling()
+
+    def _site_scanned(self, site):
+        self._featured = None
+        self._math = None
+        self._post_specs.clear()
+        self.feed_links.clear()
+        self.post_texts.clear()
+        adapters.clear()
+        if site.config.get('CHAMELEON_MULTIPROCESS'):
+            # Scanning happens in the parent process while tasks are
+            # being generated, before doit forks any workers.
+            self.prepare_for_workers()
+
+    def prepare_for_workers(self):
+        """
+        Register all the templates and compile them now.
+
+        When Nikola is run with multiple processes (``nikola build -n
+        4``), worker processes forked after this share the registrations
+        and compiled templates of this process, instead of each
+        having to repeat that work. This is done automatically when the
+        site is scanned if the configuration has ``CHAMELEON_MULTIPROCESS =
+        True``.
+
+        .. versionadded:: 1.0.1
+        """
+        self._finish_precompile()
+        self._provide_templates()
+        compiled = compile_templates()
+        logger.debug("Compiled %d templates for worker processes", len(compiled))
+        # Keep the garbage collector from touching (and thus copying)
+        # all the objects the workers inherit.
+        if hasattr(gc, 'freeze'): # Python 3.7+
+            if self._gc_frozen:
+                # Scanned again in this process (``nikola auto``):
+                # let what the last scan left behind be collected
+                # instead of keeping it forever.
+                gc.unfreeze()
+            gc.freeze()
+            self._gc_frozen = True
+
+    @property
+    def featured_posts(self):
+        """
+        The posts from the site whose status is ``featured``, as a
+        tuple.
+
+        This is computed once per scan of the site and shared by all
+        the pages that we render, so it cannot be changed by any one
+        of them.
+        """
+        posts = self.site.posts
+        featured = self._featured
+        # Guard against the list of posts being replaced or extended
+        # without a scan signal.
+        if featured is None or featured[0] is not posts or featured[1] != len(posts):
+            featured = self._featured = (
+                posts,
+                len(posts),
+                tuple(p for p in posts if p.post_status == 'featured')
+            )
+        return featured[2]
+
+    def _math_bits(self, lang):
+        # Return {post: position} for the site's posts and a bitset of
+        # the positions of those that have math in *lang*.
+        posts = self.site.posts
+        math = self._math
+        if math is None or math[0] is not posts or math[1] != len(posts):
+            math = self._math = (
+                posts,
+                len(posts),
+                {post: i for i, post in enumerate(posts)},
+                {}
+            )
+        bits = math[3].get(lang)
+        if bits is None:
+            bits = math[3][lang] = bytearray((len(posts) + 7) // 8)
+            for i, post in enumerate(posts):
+                if post.has_math:
+                    bits[i >> 3] |= 1 << (i & 7)
+        return math[2], bits
+
+    def _posts_have_math(self, posts):
+        """
+        Does any of the *posts* have math in the current language?
+
+        Whether each of the site's posts has math is found once per
+        scan of the site and language, so index pages (and tag pages,
+        and so on) that list the same posts don't ask each of them
+        again.
+        """
+        positions, bits = self._math_bits(LocaleBorg().current_lang)
+        for post in posts:
+            i = positions.get(post)
+            if i is None:
+                # Not one of the site's posts.
+                if post.has_math:
+                    return True
+            elif bits[i >> 3] & (1 << (i & 7)):
+                return True
+        return False
+
+    def precompile(self):
+        """
+        Register all the templates and begin compiling them in the
+        background, using a pool of processes.
+
+        Rendering waits for this to finish. The time spent
+        compiling each template is then logged and kept in
+        :attr:`compile_times`. This is done automatically when the
+        site is set if the configuration has ``CHAMELEON_PRECOMPILE =
+        True``.
+
+        .. versionadded:: 1.0.1
+        """
+        self._finish_precompile()
+        self._provide_templates()
+        self._compile_executor = ProcessPoolExecutor()
+        self._compilation = TemplateCompilation(self._compile_executor)
+
+    def _finish_precompile(self):
+        compilation = self._compilation
+        if compilation is None:
+            return
+        self._compilation = None
+        try:
+            times = compilation.result()
+        finally:
+            # After a failure, wait for the templates already being
+            # compiled (the rest were cancelled).
+            self._compile_executor.shutdown()
+            self._compile_executor = None
+        self.compile_times.update(times)
+        logger.info("Precompiled %d templates in %.2fs",
+                    len(times), sum(times.values()))
+        for filename, duration in sorted(times.items(), key=lambda i: i[1], reverse=True):
+            logger.debug("Compiled %s in %.3fs", filename, duration)
+
+    def start_profiling(self):
+        """
+        Begin recording the time spent rendering each template, macro
+        and content provider (see :mod:`.profiling`).
+
+        When the process exits, the report is written to
+        ``chameleon_profile.txt`` and ``chameleon_profile.json`` in the
+        cache folder. This is done automatically when the site is set
+        if the configuration has ``CHAMELEON_PROFILE = True``.
+
+        .. versionadded:: 1.0.1
+        """
+        profiling.start()
+        atexit.register(self.stop_profiling)
+
+    def stop_profiling(self):
+        """
+        Stop recording and write the report begun by
+        :meth:`start_profiling`, returning the
+        :class:`.profiling.Profile`.
+
+        .. versionadded:: 1.0.1
+        """
+        atexit.unregister(self.stop_profiling)
+        profile = profiling.stop()
+        if profile is not None and self._cache_folder is not None:
+            makedirs(self._cache_folder)
+            profile.save(self._cache_folder)
+            logger.info("Wrote rendering profile to %s",
+                        os.path.join(self._cache_folder, 'chameleon_profile.txt'))
+        return profile
 
     def set_directories(self, directories, cache_folder):
         """Sets the list of folders where templates are located and cache."""
@@ -140,25 +398,30 @@ class ChameleonTemplates(TemplateSystem):
         cache_dir = os.path.abspath(os.path.join(cache_folder, 'chameleon_cache'))
         makedirs(cache_dir)
         os.environ['CHAMELEON_CACHE'] = cache_dir
+        self._dependencies = DependencyGraph(
+            os.path.abspath(os.path.join(cache_folder, 'chameleon_deps.json')))
+        self._output_digests = OutputDigests(
+            os.path.abspath(os.path.join(cache_folder, 'chameleon_outputs.log')))
+        self._cache_folder = os.path.abspath(cache_folder)
 
         conf_mod = dottedname.resolve('chameleon.config')
-        if conf_mod.CACHE_DIRECTORY != cache_dir:
-            # previously imported before we set the environment
-            conf_mod.CACHE_DIRECTORY = cache_dir
-            # Which, snarf, means the template is probably also screwed up.
-            # It imports all of this stuff statically, and BaseTemplate
-            # statically creates a default loader at import time
-            template_mod = dottedname.resolve('chameleon.template')
-            if template_mod.CACHE_DIRECTORY != conf_mod.CACHE_DIRECTORY:
-                template_mod.CACHE_DIRECTORY = conf_mod.CACHE_DIRECTORY
-                # pylint:disable=protected-access
-                template_mod.BaseTemplate.loader = template_mod._make_module_loader()
-
-            # Creating these guys with debug or autoreload, as Pyramid does when its
-            # debug flags are set, will override this setting
+        # previously imported before we set the environment
+        conf_mod.CACHE_DIRECTORY = cache_dir
+        # Which, snarf, means the template is probably also screwed up.
+        # It imports all of this stuff statically, and BaseTemplate
+        # statically creates a default loader at import time. We replace
+        # that loader with one that shares compiled templates no matter
+        # where the theme is checked out and that limits the size of
+        # the cache.
+        template_mod = dottedname.resolve('chameleon.template')
+        template_mod.CACHE_DIRECTORY = cache_dir
+        template_mod.BaseTemplate.loader = CompiledTemplateCache(cache_dir)
+
+        # Creating these guys with debug or autoreload, as Pyramid does when its
+        # debug flags are set, will override this setting
         return
 
-    def template_deps(self, template_name):
+    def template_deps(self, template_name, context=None):
         """Returns filenames which are dependencies for a template."""
         # You *must* implement this, even if to return []
         # It should return a list of all the files that,
@@ -166,28 +429,61 @@ class ChameleonTemplates(TemplateSystem):
         # usually this involves template inheritance and
         # inclusion.
 
-        # Of the three methods that provide dependencies, this
-        # seems to be the only one that gets called.
-
         # Just the name isn't very much to go on, because we can
         # potentially be rendering different things based on the
-        # kind of context we have, if that's customized in theme.zcml.
+        # kind of context we have, if that's customized in theme.zcml,
+        # and template inclusion/extension is implemented via macros
+        # and traversal, which aren't directly recorded in the
+        # source. So we use the files the template actually used the
+        # last time it was rendered (which means that the very first
+        # build only knows about the template file itself).
+        self._provide_templates()
+        deps = []
+        filename = self._template_filename(template_name)
+        if filename is not None:
+            deps.append(filename)
+        return self._add_recorded_deps(deps, template_name)
+
+    def get_deps(self, filename, context=None):
+        """Returns filenames which are dependencies for the shortcode template *filename*."""
+        # Nikola already includes the file itself.
         self._provide_templates()
+        return self._add_recorded_deps([], os.path.abspath(filename))
+
+    def get_string_deps(self, text, context=None):
+        """Returns filenames which are dependencies for the shortcode template *text*."""
+        self._provide_templates()
+        shortcode = self._shortcode_templates.get(text)
+        if shortcode is None:
+            # Not one of ours, so it can't be rendered either.
+            return []
+        filename = shortcode.path
+        return self._add_recorded_deps([filename], filename)
+
+    def get_template_path(self, template_name):
+        """Returns the path to the template file for *template_name*, or None."""
+        self._provide_templates()
+        return self._template_filename(template_name)
+
+    def _template_filename(self, template_name):
+        shortcode = self._shortcode_templates.get(template_name)
+        if shortcode is not None:
+            return shortcode.path
         try:
             template = component.getMultiAdapter((object(), object(), object()),
                                                  IContentTemplate,
                                                  name=template_name)
         except LookupError:
-            return []
-
-        # This doesn't really get us very far, because template
-        # inclusion/extension is implemented via macros and traversal,
-        # which aren't directly recorded in the source. But at least we can
-        # get direct template file modifications.
-        return [template.filename]
-
+            # Perhaps only registered in theme.zcml for particular
+            # layers or contexts.
+            return None
+        return template.filename
 
-    get_deps = template_deps # For shortcodes
+    def _add_recorded_deps(self, deps, name):
+        for filename in self._dependencies.get(name) + self._theme_files:
+            if filename not in deps:
+                deps.append(filename)
+        return deps
 
 
     def render_template(self, template_name, output_name, context):
@@ -196,19 +492,58 @@ class ChameleonTemplates(TemplateSystem):
         This must save the data to output_name *and* return it
         so that the caller may do additional processing.
         """
-        result = self.render_template_to_string(template_name, context)
-        if output_name is not None: # pragma: no cover (Nikola doesn't seem to use this)
-            makedirs(os.path.dirname(output_name))
-            with open(output_name, 'wb') as f:
-                f.write(result.encode('utf-8'))
-        return result
+        if output_name is None:
+            # Nikola always does this.
+            return self.render_template_to_string(template_name, context)
+        self.render_template_to_file(template_name, output_name, context)
+        with io.open(output_name, 'r', encoding='utf-8', newline='') as f:
+            return f.read()
+
+    def render_template_to_file(self, template_name, output_name, context):
+        """
+        Renders template to the file *output_name* using context,
+        without keeping the whole result in memory.
+
+        Nikola 8 doesn't call this: it always renders pages to strings
+        with ``render_template(name, None, context)`` and writes them
+        itself. This is for other callers, such as plugins, that have
+        an output file name.
+
+        If *output_name* already has exactly the rendered contents (as
+        recorded when we last wrote it), it is not written again,
+        which leaves its modification time alone.
+
+        :return: Whether *output_name* was written.
+
+        .. versionadded:: 1.0.1
+        """
+        output_name = os.path.abspath(output_name)
+        makedirs(os.path.dirname(output_name))
+        return write_if_changed(output_name, self._output_digests,
+                                lambda f: self._render(template_name, context, f))
 
     def render_template_to_string(self, template, context):
         """Renders template to a string using context. """
+        return self._render(template, context)
+
+    def _render(self, template, context, output=None):
+        # Shortcode templates are known by their file.
+        shortcode = self._shortcode_templates.get(template)
+        name = shortcode.path if shortcode is not None else template
+        with recording() as files:
+            result = profiling.call('render',
+                                    name if _is_template_name(name) else '<string>',
+                                    self._render_template, template, context, output)
+        if _is_template_name(name):
+            self._dependencies.add(name, files)
+        return result
+
+    def _render_template(self, template, context, output):
         # The method that does the actual rendering.
         # template_name is the name of the template file,
         # context is a dictionary containing the data the template
         # uses for rendering.
+        self._finish_precompile()
         self._provide_templates()
 
         # context becomes the options dict.
@@ -221,7 +556,7 @@ class ChameleonTemplates(TemplateSystem):
             # Make the 'featured' list available to all pages, not just
             # indexes. Added in nikola 8, but only for indexes.
             if 'featured' not in options:
-                options['featured'] = [p for p in self.site.posts if p.post_status == 'featured']
+                options['featured'] = self.featured_posts
             if template == 'gallery.tmpl':
                 # Some galleries can have posts
                 context = _GalleryContext(options)
@@ -234,19 +569,12 @@ class ChameleonTemplates(TemplateSystem):
                 # shortcode, once for rendering the page. We still don't bother
                 # to strip or proxy, though, because the interfaces
                 # should be idempotent.
-                interface.alsoProvides(context, interfaces.IPostPage)
-                # XXX: Need to look at the post's `type` and add that to the
-                # post https://getnikola.com/handbook.html#post-types
-                if context.has_math:
-                    interface.alsoProvides(context, interfaces.IMathJaxPost)
-                if context.meta[context.default_lang].get('nti-extra-page-kind', '') == 'root':
-                    interface.alsoProvides(context, interfaces.IRootPage)
+                self._provide_post_markers(context)
         elif 'posts' in options:
-            context = _PostListContext(options['posts'])
-            for post in context:
-                if post.has_math:
-                    context = _MathJaxPostListContext(options['posts'])
-                    break
+            if self._posts_have_math(options['posts']):
+                context = _MathJaxPostListContext(options['posts'])
+            else:
+                context = _PostListContext(options['posts'])
         elif 'code' in options and template == 'listing.tmpl':
             context = _ListingContext(options)
         elif template == 'gallery.tmpl':
@@ -259,14 +587,17 @@ class ChameleonTemplates(TemplateSystem):
                         template, list(options))
             context = _Context()
 
-        request = Request(context, options)
-        # apply the "layer" to the request
-        self._apply_request_layer(request, options, template)
+        # The class of the request carries the "layer"
+        request = self._request_for(context, options, template)
 
         # Apply other markers to the view
-        view = self.new_view_for_context(context, request)
+        view = self.view_for_context(context, request)
 
-        template = getViewTemplate(template, view, request, context)
+        shortcode = self._shortcode_templates.get(template)
+        if shortcode is not None:
+            template = shortcode(view, request, context)
+        else:
+            template = getViewTemplate(template, view, request, context)
 
 
         # Make the context available.
@@ -280,21 +611,76 @@ class ChameleonTemplates(TemplateSystem):
             options['messages'] = self.site.MESSAGES
 
 
+        if output is not None:
+            render_to_file = getattr(template, 'render_to_file', None)
+            if render_to_file is not None:
+                return render_to_file(output, view, request=request, **options)
+            # Not one of our templates (for example, the wrapper
+            # z3c:template uses for a macro= template), so it can
+            # only render to a string.
+            output.write(template(view, request=request, **options))
+            return None
         return template(view, request=request, **options)
 
-    def _apply_request_layer(self, request, options, template):
+    def _provide_post_markers(self, post):
+        # Posts are often rendered more than once (shortcodes), and
+        # each change to what an object provides discards the
+        # adapter lookup caches of its specification, so we
+        # decide the markers once per post and language and
+        # thereafter only check that they're still in place.
+        lang = LocaleBorg().current_lang
+        specs = self._post_specs.get(post)
+        if specs is None:
+            specs = self._post_specs[post] = {}
+        spec = specs.get(lang)
+        if spec is not None and interface.providedBy(post) is spec:
+            return
+
+        markers = [interfaces.IPostPage]
+        # XXX: Need to look at the post's `type` and add that to the
+        # post https://getnikola.com/handbook.html#post-types
+        if post.has_math:
+            markers.append(interfaces.IMathJaxPost)
+        if post.meta[post.default_lang].get('nti-extra-page-kind', '') == 'root':
+            markers.append(interfaces.IRootPage)
+        interface.directlyProvides(post, interface.directlyProvidedBy(post), *markers)
+        specs[lang] = interface.providedBy(post)
+
+    def _request_for(self, context, options, template):
         pagekind = frozenset(options.get('pagekind', ()))
-        interface.alsoProvides(request, interfaces.PAGEKINDS[pagekind])
-        if template == 'book.tmpl':
-            # Special support for the book pseudo-kind
-            interface.alsoProvides(request, interfaces.IBookPageKind)
+        return request_factory(pagekind, template)(context, options)
+
+    def view_for_context(self, context, request):
+        """
+        Return the view for *context* while rendering *request*.
+
+        Each context gets one view per request (which is to say, per
+        rendering), made by :meth:`new_view_for_context` the first
+        time it is needed. Templates like ``index.tmpl`` traverse
+        through each post to several macros
+        (``post/@@macros/comment_link``), and they all share it.
+
+        .. versionadded:: 1.0.1
+        """
+        views = request.views
+        view = views.get(id(context))
+        if view is None or view.context is not context:
+            view = views[id(context)] = self.new_view_for_context(context, request)
+        return view
 
     def new_view_for_context(self, context, request):
+        """
+        Return a new :class:`.View` for *context* while rendering
+        *request*, providing the comment kind interface (such as
+        :class:`~.ICommentKindNone`) that applies.
+        """
         # XXX: These are really layers that should be on the
         # request, not the view. The view should have more of a relationship
         # to the template being requested?
-        view = View(context, request, self)
-        options = request.options
+        return view_factory(self._comment_kind(context, request.options))(
+            context, request, self)
+
+    def _comment_kind(self, context, options):
         if not interfaces.IPost.providedBy(context):
             # If it's not a post, it can't possibly have comments.
             # XXX: When the context is not a post, as in when we're
@@ -307,8 +693,8 @@ class ChameleonTemplates(TemplateSystem):
             # through posts here and applying this info to them? But still, that
             # would require rebinding the context to the post in the same mechanism,
             # so it doesn't make much difference.
-            interface.alsoProvides(view, interfaces.ICommentKindNone)
-        elif (
+            return interfaces.ICommentKindNone
+        if (
                 # comments enabled for the site?
                 options['site_has_comments']
                 # enabled for the page kind?
@@ -318,12 +704,9 @@ class ChameleonTemplates(TemplateSystem):
             comment_system = options['comment_system']
             # TODO: Make this extensible, allow plugins and themes to
             # define their own comment systems.
-            iface = interfaces.COMMENTSYSTEMS[comment_system]
-            interface.alsoProvides(view, iface)
-        else:
-            # Things like galleries and pages that have comments disabled
-            interface.alsoProvides(view, interfaces.ICommentKindNone)
-        return view
+            return interfaces.COMMENTSYSTEMS[comment_system]
+        # Things like galleries and pages that have comments disabled
+        return interfaces.ICommentKindNone
 
     def inject_directory(self, directory): # pragma: no cover (Nikola seems not to call this)
         """Injects the directory with the lowest priority in the
@@ -334,6 +717,11 @@ class ChameleonTemplates(TemplateSystem):
         self._template_paths.insert(0, directory)
 
     def _provide_templates(self):
+        if self._template_paths or self._shortcode_paths:
+            # We're about to register new templates
+            # (and whatever theme.zcml wants).
+            TEMPLATE_FACTORIES.clear()
+            MACRO_FACTORIES.clear()
         for d in self._template_paths:
             self._provide_templates_from_directory(d)
         for d in self._shortcode_paths:
@@ -358,7 +746,8 @@ class ChameleonTemplates(TemplateSystem):
         # file. This doesn't deal with naming conflicts.
         gsm = component.getGlobalSiteManager()
         for macro_file in sorted(glob.glob(os.path.join(directory, "*.macro.pt"))):
-            template = NikolaPageFileTemplate(macro_file)
+            # The factories share this template.
+            template = macro_template(macro_file)
             for name in template.macros.names:
                 factory = MacroFactory(macro_file, name, 'text/html')
                 if name in seen_macros: # pragma: no cover
@@ -394,6 +783,7 @@ class ChameleonTemplates(TemplateSystem):
 
         theme_zcml = os.path.join(directory, 'theme.zcml')
         if os.path.exists(theme_zcml):
+            self._theme_files.append(theme_zcml)
             # Let any explicit directions take precedence.
             xmlconfig.file(theme_zcml, context=self._conf_context)
 
@@ -401,16 +791,15 @@ class ChameleonTemplates(TemplateSystem):
         # Nikola passes shortcode templates as the *contents* of the file,
         # not the file name.
         directory = self.__fixup_directory(directory)
-        gsm = component.getGlobalSiteManager()
         for template_file in sorted(glob.glob(os.path.join(directory, "*.tmpl"))):
             with open(template_file, 'r') as f:
-                name = f.read()
-            factory = TemplateFactory(template_file, 'text/html')
-            # Register them as template adapters for us.
-            # required = (view, request, context)
-            gsm.registerAdapter(factory,
-                                provided=(IContentTemplate),
-                                required=(interface.Interface,
-                                          interface.Interface,
-                                          interface.Interface),
-                                name=name)
+                contents = f.read()
+            self._shortcode_templates[contents] = TemplateFactory(template_file, 'text/html')
+
+
+try:
+    from zope.testing import cleanup
+except ImportError: # pragma: no cover
+    pass
+else:
+    cleanup.addCleanUp(TEMPLATE_FACTORIES.clear)
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Measuring where rendering spends its time.
+
+When a :class:`Profile` is active (see :func:`start`), each top-level
+render of a template name, each rendering of a template file
+(including viewlets), each ``@@macros`` macro included, and each
+``provider:`` expression (which is how viewlet managers are rendered)
+is counted and timed. Each of those records the wall time spent in
+it, both in total and excluding the time spent in the others it
+contains.
+
+Enable this for a build with the ``CHAMELEON_PROFILE`` setting.
+
+.. versionadded:: 1.0.1
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import os
+import os.path
+from time import perf_counter
+
+from chameleon.astutil import Symbol
+from z3c.pt.expressions import ProviderExpr as _ProviderExpr
+from z3c.pt.expressions import render_content_provider as _render_content_provider
+
+#: The active :class:`Profile`, if any.
+_PROFILE = None
+
+
+class Profile(object):
+    """
+    The number of calls and time spent in each kind of thing that has
+    been rendered.
+
+    .. attribute:: entries
+
+       A dictionary from ``(kind, name)`` to a list of the number of
+       calls, the total seconds and the seconds not spent in other
+       entries.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        # The times spent in the children of the calls in progress.
+        self._children = []
+
+    def call(self, kind, name, func, args, kwargs):
+        children = self._children
+        children.append(0.0)
+        start = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            duration = perf_counter() - start
+            inner = children.pop()
+            if children:
+                children[-1] += duration
+            entry = self.entries.get((kind, name))
+            if entry is None:
+                entry = self.entries[(kind, name)] = [0, 0.0, 0.0]
+            entry[0] += 1
+            entry[1] += duration
+            entry[2] += duration - inner
+
+    def sorted_entries(self):
+        """
+        Return a list of ``(kind, name, calls, total, own)`` for each
+        entry, with the most time spent in the entry itself first.
+        """
+        return sorted(((kind, name) + tuple(entry)
+                       for (kind, name), entry in self.entries.items()),
+                      key=lambda e: (-e[4], e[0], e[1]))
+
+    def report(self):
+        """
+        Return a table of the :meth:`sorted_entries` as text.
+        """
+        lines = ['%8s %10s %10s %10s  %-8s %s' % ('calls', 'total (s)', 'own (s)',
+                                                  'per call', 'kind', 'name')]
+        for kind, name, calls, total, own in self.sorted_entries():
+            lines.append('%8d %10.3f %10.3f %10.6f  %-8s %s' % (
+                calls, total, own, total / calls, kind, name))
+        return '\n'.join(lines) + '\n'
+
+    def save(self, directory):
+        """
+        Write the :meth:`report` to ``chameleon_profile.txt`` and the
+        entries to ``chameleon_profile.json`` in *directory*.
+        """
+        with open(os.path.join(directory, 'chameleon_profile.txt'), 'w') as f:
+            f.write(self.report())
+        with open(os.path.join(directory, 'chameleon_profile.json'), 'w') as f:
+            json.dump([
+                {'kind': kind, 'name': name, 'calls': calls, 'total': total, 'own': own}
+                for kind, name, calls, total, own in self.sorted_entries()
+            ], f, indent=1)
+
+
+def start():
+    """
+    Make a new :class:`Profile` active and return it.
+    """
+    global _PROFILE
+    _PROFILE = Profile()
+    return _PROFILE
+
+
+def stop():
+    """
+    Stop profiling, and return the :class:`Profile` that was active.
+    """
+    global _PROFILE
+    profile, _PROFILE = _PROFILE, None
+    return profile
+
+
+def call(kind, name, func, *args, **kwargs):
+    """
+    Call *func* with the *args* and *kwargs*, adding it to the active
+    :class:`Profile` (if any) as *name* of the given *kind*.
+    """
+    profile = _PROFILE
+    if profile is None:
+        return func(*args, **kwargs)
+    return profile.call(kind, name, func, args, kwargs)
+
+
+def render_content_provider(econtext, name):
+    """
+    Render the content provider *name* for a ``provider:`` expression,
+    as :func:`z3c.pt.expressions.render_content_provider` does.
+    """
+    return call('provider', name.strip(), _render_content_provider, econtext, name)
+
+
+class ProviderExpr(_ProviderExpr):
+    """
+    The ``provider:`` expression type used by our templates.
+    """
+    transform = Symbol(render_content_provider)
+
+
+try:
+    from zope.testing import cleanup
+except ImportError: # pragma: no cover
+    pass
+else:
+    cleanup.addCleanUp(stop)
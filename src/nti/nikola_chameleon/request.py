@@ -8,14 +8,109 @@ from __future__ import division
 from __future__ import print_function
 
 # stdlib imports
+from collections.abc import ItemsView
+from collections.abc import KeysView
+from collections.abc import ValuesView
+from itertools import chain
+from itertools import filterfalse
 
 from zope import interface
 
 from zope.publisher.interfaces.browser import IDefaultBrowserLayer
 
+from . import interfaces
 
 logger = __import__('logging').getLogger(__name__)
 
+_marker = object()
+
+
+class LayeredOptions(dict):
+    """
+    The options dictionary *base* as seen by something that adds to
+    it, or replaces some of it.
+
+    This holds only its own items, given as for :class:`dict`, which
+    take precedence over *base*. Other items are read from *base*.
+    Changes are made to this object, never to *base*, so this can be
+    used instead of a copy of *base* without copying it.
+
+    This is a :class:`dict`, because Chameleon path expressions handle
+    dictionaries specially, but it behaves as if it were the merged
+    dictionary: ``**options`` or ``dict(options)`` produces one.
+    Iterating it, its views and its length don't copy *base*.
+
+    Removing items (``del``, ``pop``, ``popitem``, ``clear``) only
+    removes this object's own items; the items of *base* are still
+    visible afterwards. So removing a key that is only in *base*
+    raises :exc:`KeyError` (or ``pop`` returns its default) although
+    the key is still ``in`` this object.
+
+    .. versionadded:: 1.0.1
+    """
+
+    __slots__ = ('base',)
+
+    def __init__(self, base, *args, **kwargs):
+        dict.__init__(self, *args, **kwargs)
+        self.base = base
+
+    def __missing__(self, key):
+        return self.base[key]
+
+    def get(self, key, default=None):
+        value = dict.get(self, key, _marker)
+        if value is _marker:
+            value = self.base.get(key, default)
+        return value
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self.base
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        self[key] = default
+        return default
+
+    def copy(self):
+        """
+        Return a new :class:`dict` with all the items.
+        """
+        result = dict(self.base)
+        result.update(dict.items(self))
+        return result
+
+    def keys(self):
+        return KeysView(self)
+
+    def values(self):
+        return ValuesView(self)
+
+    def items(self):
+        return ItemsView(self)
+
+    def __iter__(self):
+        # Our own keys, then those of base that we don't override.
+        return chain(dict.__iter__(self),
+                     filterfalse(dict.__contains__.__get__(self), self.base))
+
+    def __len__(self):
+        base = self.base
+        return len(base) + sum(1 for key in dict.__iter__(self) if key not in base)
+
+    def __eq__(self, other):
+        return self.copy() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self.copy())
+
+
 class Response(object):
 
     def getHeader(self, name): # response
@@ -35,3 +130,55 @@ class Request(object):
         # the 'context' argument to render_template.
         self.context = context
         self.options = options
+        # {id(context): view} for the views of the contexts used
+        # while rendering; see ChameleonTemplates.view_for_context.
+        self.views = {}
+
+
+#: The template name that gets the special
+#: :class:`~.IBookPageKind` layer.
+BOOK_TEMPLATE = 'book.tmpl'
+
+#: A map from ``(pagekind, template)`` to a subclass of
+#: :class:`Request` that implements the layers for that kind of page.
+#: *pagekind* is a frozenset of the ``pagekind`` values given
+#: by Nikola, and *template* is either None or :data:`BOOK_TEMPLATE`.
+#: Because every request for the same kind of page shares one class,
+#: they also share one specification, and so they share the adapter
+#: lookup caches of that specification.
+REQUEST_LAYERS = {}
+
+
+def _layered_request(*layers):
+    name = 'Request_' + '_'.join(layer.__name__ for layer in layers)
+    cls = type(str(name), (Request,), {'__module__': __name__})
+    interface.classImplements(cls, *layers)
+    return cls
+
+
+def request_factory(pagekind, template):
+    """
+    Return the :class:`Request` class for rendering the *template*
+    for the *pagekind* (a frozenset).
+
+    Raises a :exc:`KeyError` for unknown page kinds.
+    """
+    return REQUEST_LAYERS[(pagekind, BOOK_TEMPLATE if template == BOOK_TEMPLATE else None)]
+
+
+def _cleanUp():
+    REQUEST_LAYERS.clear()
+    for pagekind, layer in interfaces.PAGEKINDS.items():
+        REQUEST_LAYERS[(pagekind, None)] = _layered_request(layer)
+        # Special support for the book pseudo-kind
+        REQUEST_LAYERS[(pagekind, BOOK_TEMPLATE)] = _layered_request(layer,
+                                                                     interfaces.IBookPageKind)
+
+_cleanUp()
+
+try:
+    from zope.testing import cleanup
+except ImportError: # pragma: no cover
+    pass
+else:
+    cleanup.addCleanUp(_cleanUp)
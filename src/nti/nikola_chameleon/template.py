@@ -7,6 +7,12 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import threading
+from time import perf_counter
+from types import FunctionType
+from weakref import WeakSet
+
+from chameleon.zpt.template import Macros
 from chameleon.zpt.template import PageTemplateFile
 import z3c.macro.zcml
 from z3c.pt.pagetemplate import ViewPageTemplateFile
@@ -20,10 +26,68 @@ import zope.pagetemplate.pagetemplatefile
 import zope.viewlet.viewlet
 import zope.viewlet.manager
 
+from zope import component
+from zope import interface
+
 from nikola.utils import LocaleBorg
 
+from .cache import template_digest
+from .dependencies import record
+from . import profiling
+from .request import LayeredOptions
+
 logger = __import__('logging').getLogger(__name__)
 
+#: All the :class:`NikolaPageFileTemplate` objects that are
+#: still in use. See :func:`compile_templates`.
+_TEMPLATES = WeakSet()
+
+#: ``streams.pending`` is ``(template, stream)`` while
+#: :meth:`NikolaPageFileTemplate.render_to_file` is starting to render
+#: *template* to *stream* in this thread.
+_STREAMS = threading.local()
+
+
+class _StreamingOutput(list):
+    # A Chameleon output stream that writes what is rendered to a text
+    # file in batches instead of keeping all of it.
+
+    batch_size = 256
+
+    def __init__(self, f):
+        list.__init__(self)
+        self._file = f
+        self._written = 0
+
+    def append(self, s):
+        list.append(self, s)
+        if list.__len__(self) >= self.batch_size:
+            self._file.write(''.join(self))
+            self._written += list.__len__(self)
+            list.__delitem__(self, slice(None))
+
+    def __len__(self):
+        return self._written + list.__len__(self)
+
+    def __delitem__(self, index):
+        # tal:on-error discards what its failed element wrote.
+        if (isinstance(index, slice) and index.stop is None
+                and index.start >= self._written):
+            list.__delitem__(self, slice(index.start - self._written, None))
+            return
+        raise ValueError("Cannot discard output that has been written")
+
+
+class _RecordingMacros(Macros):
+    # Macros are used without rendering the template that
+    # defines them.
+    __slots__ = ()
+
+    def __getitem__(self, name):
+        record(self.template.filename)
+        return Macros.__getitem__(self, name)
+
+
 class NikolaPageFileTemplate(ViewPageTemplateFile):
     """
     ZPT file templates for use with Nikola.
@@ -52,7 +116,29 @@ class NikolaPageFileTemplate(ViewPageTemplateFile):
             # I think)
             path = None
         super(NikolaPageFileTemplate, self).__init__(template_file, path=path, **kwargs)
+        self.macros = _RecordingMacros(self)
+        _TEMPLATES.add(self)
+
+
+    def digest(self, body, names):
+        # Don't depend on the location of the file; see .cache.
+        return template_digest(self, body, names)
 
+    def _cook(self, body, name, builtins):
+        cooked = super(NikolaPageFileTemplate, self)._cook(body, name, builtins)
+        if cooked.get('__filename') != self.filename:
+            # Because of the digest, the module may have been compiled
+            # from the same contents in another file, whose name it
+            # reports errors with. Give our functions globals with our
+            # name.
+            cooked = dict(cooked)
+            cooked['__filename'] = self.filename
+            initialize = cooked['initialize']
+            cooked['initialize'] = FunctionType(initialize.__code__, cooked,
+                                                initialize.__name__,
+                                                initialize.__defaults__,
+                                                initialize.__closure__)
+        return cooked
 
     def _builtins(self):
         d = super(NikolaPageFileTemplate, self).builtins
@@ -65,20 +151,50 @@ class NikolaPageFileTemplate(ViewPageTemplateFile):
         context = super(NikolaPageFileTemplate, self)._pt_get_context(
             instance, request, kwargs)
         # Set up translation
+        options = kwargs
         if 'messages' not in kwargs:
             assert context['options'] is kwargs
             # We are being called by a content provider or viewlet,
             # not directly from ChameleonTemplates. Therefore we need
             # to install the extra options again, being careful not to
-            # overwrite what was passed in
-            orig_options = context['request'].options
-            for k, v in orig_options.items():
-                if k not in kwargs:
-                    kwargs[k] = v
+            # overwrite what was passed in. There are many of them,
+            # and many viewlets, so we don't copy them.
+            options = context['options'] = LayeredOptions(context['request'].options, kwargs)
 
-        context['translate'] = MessagesTranslate(kwargs['messages'])
+        context['translate'] = MessagesTranslate(options['messages'])
         return context
 
+    def render_to_file(self, f, *args, **kwargs):
+        """
+        Call this template with the *args* and *kwargs*, writing the
+        output to the text file *f* instead of returning it.
+
+        The output is written as it is rendered, so it is never all in
+        memory at once. Because of that, a ``tal:on-error`` can't
+        discard output that has already been written; its element
+        should be small.
+
+        .. versionadded:: 1.0.1
+        """
+        previous = getattr(_STREAMS, 'pending', None)
+        _STREAMS.pending = (self, _StreamingOutput(f))
+        try:
+            # This returns what hasn't been written yet.
+            rest = self(*args, **kwargs)
+        finally:
+            _STREAMS.pending = previous
+        f.write(rest)
+
+    def output_stream_factory(self):
+        # Chameleon calls this for the output of each rendering. The
+        # stream from render_to_file is just for its own rendering,
+        # not any that it includes (not even of this template).
+        pending = getattr(_STREAMS, 'pending', None)
+        if pending is not None and pending[0] is self:
+            _STREAMS.pending = None
+            return pending[1]
+        return super(NikolaPageFileTemplate, self).output_stream_factory()
+
     def render(self, target_language=None, **context):
         # We bypass BaseTemplate.render because it wants to setup
         # a bunch of translation stuff that's only applicable to
@@ -90,12 +206,15 @@ class NikolaPageFileTemplate(ViewPageTemplateFile):
             target_language = LocaleBorg().current_lang
 
         context['target_language'] = target_language
+        record(self.filename)
         # pylint:disable=bad-super-call
-        return super(BaseTemplate, self).render(**context)
+        return profiling.call('template', self.filename,
+                              super(BaseTemplate, self).render, **context)
 
 BaseTemplate.expression_types['structure'] = PageTemplateFile.expression_types['structure']
 BaseTemplate.expression_types['load'] = PageTemplateFile.expression_types['load']
 BaseTemplate.expression_types['import'] = PageTemplateFile.expression_types['import']
+BaseTemplate.expression_types['provider'] = profiling.ProviderExpr
 zope.browserpage.simpleviewclass.ViewPageTemplateFile = NikolaPageFileTemplate
 zope.viewlet.viewlet.ViewPageTemplateFile = NikolaPageFileTemplate
 zope.viewlet.manager.ViewPageTemplateFile = NikolaPageFileTemplate
@@ -119,6 +238,154 @@ class TemplateFactory(z3c.template.template.TemplateFactory):
 
 z3c.template.template.TemplateFactory = TemplateFactory
 
+
+class FactoryCache(object):
+    """
+    Caches the factories of named multi-adapters to *provided*
+    (such as ``IContentTemplate`` or ``IMacroTemplate``).
+
+    The key is the name and the specifications provided by the
+    objects being adapted; for a given set of registrations, the
+    answer for that key never changes. The cache is cleared when the
+    adapter registry of the current site manager (or one of its
+    bases) changes, however the change was made (ZCML,
+    ``provideAdapter``, a different site...), which is noticed
+    through the registries' generation counters.
+
+    .. versionadded:: 1.0.1
+    """
+
+    def __init__(self, provided):
+        self.provided = provided
+        #: The number of lookups answered from the cache.
+        self.hits = 0
+        #: The number of lookups that had to go to the site manager.
+        self.misses = 0
+        self._factories = {}
+        # The registry and the generations of it and its bases that
+        # the factories were found in.
+        self._adapters = None
+        self._generations = None
+
+    def clear(self):
+        self._factories.clear()
+        self._adapters = None
+
+    def __len__(self):
+        return len(self._factories)
+
+    def query(self, name, *objects):
+        """
+        Like ``queryMultiAdapter(objects, provided, name)``.
+        """
+        adapters = component.getSiteManager().adapters
+        # pylint:disable=protected-access
+        generations = [registry._generation for registry in adapters.ro]
+        if adapters is not self._adapters or generations != self._generations:
+            self._factories.clear()
+            self._adapters = adapters
+            self._generations = generations
+
+        key = (name,) + tuple(map(interface.providedBy, objects))
+        try:
+            factory = self._factories[key]
+        except KeyError:
+            self.misses += 1
+            factory = adapters.lookup(key[1:], self.provided, name=name)
+            self._factories[key] = factory
+        else:
+            self.hits += 1
+        return factory(*objects) if factory is not None else None
+
+
+def _cook(template):
+    start = perf_counter()
+    template.cook_check()
+    return template.filename, perf_counter() - start
+
+def _cook_file(filename):
+    # In a worker process. Compiling writes the module to the
+    # cache directory, from which the parent process loads it.
+    return _cook(NikolaPageFileTemplate(filename))
+
+def _times(results):
+    times = {}
+    for filename, duration in results:
+        times[filename] = times.get(filename, 0) + duration
+    return times
+
+
+class TemplateCompilation(object):
+    """
+    Compiles each :class:`NikolaPageFileTemplate` in use that hasn't
+    been compiled yet.
+
+    This includes the templates registered for template names, macros,
+    views and viewlets.
+
+    If *executor* is None, the templates are compiled immediately.
+    Otherwise, they are compiled in the background by the
+    :class:`concurrent.futures.ProcessPoolExecutor`; call
+    :meth:`result` before rendering. The processes compile each
+    template file into the compiled template cache, and :meth:`result`
+    loads them from there. (Compiling holds the GIL, so threads
+    wouldn't be faster, and Chameleon's compiler isn't safe to run in
+    several threads at once.)
+
+    .. versionadded:: 1.0.1
+    """
+
+    def __init__(self, executor=None):
+        # pylint:disable=protected-access
+        self.templates = [t for t in list(_TEMPLATES) if not t._cooked]
+        self._times = None
+        self._futures = None
+        if executor is None:
+            self._times = _times(_cook(t) for t in self.templates)
+        else:
+            filenames = sorted({t.filename for t in self.templates})
+            self._futures = [executor.submit(_cook_file, f) for f in filenames]
+
+    def done(self):
+        return self._futures is None or all(f.done() for f in self._futures)
+
+    def result(self):
+        """
+        Wait for the templates to be compiled, and return a dictionary
+        mapping each file name to the number of seconds spent
+        compiling it.
+
+        If compiling any template fails, the templates not yet being
+        compiled are cancelled and the exception is raised.
+        """
+        futures = self._futures
+        if futures is not None:
+            self._futures = None
+            try:
+                self._times = _times(f.result() for f in futures)
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+            # Anything compiled by another process comes from the
+            # cache.
+            for template in self.templates:
+                template.cook_check()
+        return self._times
+
+
+def compile_templates():
+    """
+    Compile each :class:`NikolaPageFileTemplate` in use that hasn't
+    been compiled yet.
+
+    Returns a dictionary mapping the file names compiled to the
+    number of seconds it took. See :class:`TemplateCompilation`.
+
+    .. versionadded:: 1.0.1
+    """
+    return TemplateCompilation().result()
+
 # We also fix the namespaces in z3c.pt.namespaces to use the
 # real namespace object.
 # See https://github.com/zopefoundation/z3c.pt/issues/3
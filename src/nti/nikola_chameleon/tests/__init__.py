@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for nti.nikola_chameleon, and the test doubles they (and the
+benchmarks) share.
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from nikola.utils import Functionary
+
+from zope import interface
+
+from nti.nikola_chameleon import interfaces
+
+
+@interface.implementer(interfaces.IPost)
+class MockPost(object):
+    """
+    Just enough of a :class:`nikola.post.Post` to render.
+    """
+
+    default_lang = 'en'
+    has_math = False
+
+    def __init__(self, post_status='published', number=0):
+        self.number = number
+        self.post_status = post_status
+        self.meta = Functionary(dict, self.default_lang)
+        self.meta[self.default_lang]['title'] = u'Post %d' % number
+
+    def title(self):
+        return self.meta[self.default_lang]['title']
+
+
+class MockSite(object):
+    """
+    Just enough of a :class:`nikola.nikola.Nikola` to render.
+    """
+
+    debug = False
+
+    def __init__(self, posts=()):
+        self.posts = list(posts)
+        self.config = {}
+        self.MESSAGES = lambda msgid, lang=None: msgid
+
+    @classmethod
+    def with_posts(cls, post_count, featured_count=10):
+        """
+        A site with *post_count* posts, a constant number of which
+        are featured, spread through the site.
+        """
+        featured_every = max(post_count // featured_count, 1)
+        return cls([
+            MockPost('featured' if i % featured_every == 0 else 'published', i)
+            for i in range(post_count)
+        ])
+
+
+class MockTemplates(object):
+    """
+    Just enough of a :class:`.ChameleonTemplates` for the views and
+    viewlets that keep things in it for the build.
+    """
+
+    def __init__(self):
+        from nti.nikola_chameleon.view import TextCache
+        self.feed_links = {}
+        self.post_texts = TextCache()
+
+    def view_for_context(self, context, request):
+        return request.options['view']
+
+
+class MockView(object):
+    """
+    The ``view`` option: the view of the page being rendered.
+    """
+
+    def __init__(self):
+        self.templates = MockTemplates()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for the rendering pipeline.
+
+These are not run as part of the test suite. They use :mod:`pyperf`
+(install the ``benchmarks`` extra) and are run individually, e.g.::
+
+    python -m nti.nikola_chameleon.tests.benchmarks.bm_featured
+
+:mod:`.bm_pipeline` measures each stage of rendering the pages of a
+real (generated) site, and :mod:`.bm_site_build` measures building
+sites of 1,000 to 100,000 posts.
+
+The helpers in this module build a :class:`.ChameleonTemplates`
+that renders from a directory of templates without needing a full
+Nikola site.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+
+from nikola.utils import LocaleBorg
+
+#: A template that renders a little bit of post data, using
+#: the commonly-used ``featured`` option.
+POST_TEMPLATE = u"""
+<article>
+  <h1>${context/title}</h1>
+  <ul>
+    <li tal:repeat="post options/featured">${post/title}</li>
+  </ul>
+</article>
+"""
+
+
+class TemplateDirectory(object):
+    """
+    A temporary directory of templates and a cache.
+    """
+
+    def __init__(self, templates):
+        self.root = tempfile.mkdtemp(prefix='nti.nikola_chameleon.bm.')
+        self.template_dir = os.path.join(self.root, 'templates')
+        self.cache_dir = os.path.join(self.root, 'cache')
+        os.makedirs(self.template_dir)
+        for name, text in templates.items():
+            with open(os.path.join(self.template_dir, name), 'w') as f:
+                f.write(text)
+
+    def close(self):
+        shutil.rmtree(self.root, True)
+
+
+def make_templates(site, template_dir):
+    """
+    Return a new :class:`.ChameleonTemplates` rendering
+    from the *template_dir* for the *site*.
+
+    Only one of these can be created per process.
+    """
+    from nti.nikola_chameleon.plugin import ChameleonTemplates
+    LocaleBorg.initialize({}, 'en')
+    templates = ChameleonTemplates()
+    templates.set_directories([template_dir.template_dir], template_dir.cache_dir)
+    templates.site = site
+    return templates
+
+
+def post_options(post):
+    """
+    The minimal options dictionary Nikola would pass to render
+    a *post*.
+    """
+    return {
+        'post': post,
+        'pagekind': ['post_page'],
+        'site_has_comments': False,
+        'lang': 'en',
+    }
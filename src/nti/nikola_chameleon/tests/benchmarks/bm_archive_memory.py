@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark writing a 10,000 entry archive page to a file, either by
+rendering it to a string and writing that (as ``render_template``
+used to), or by streaming it with ``render_template_to_file``.
+
+This is most interesting for the peak memory used while writing the
+page. Run it with ``--peak`` to measure that with :mod:`tracemalloc`
+instead of timing it::
+
+    python -m nti.nikola_chameleon.tests.benchmarks.bm_archive_memory --peak
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import sys
+import tracemalloc
+
+import pyperf
+
+from nti.nikola_chameleon.tests import MockSite
+from nti.nikola_chameleon.tests.benchmarks import TemplateDirectory
+from nti.nikola_chameleon.tests.benchmarks import make_templates
+
+ENTRIES = 10000
+
+ARCHIVE_TEMPLATE = u"""
+<html>
+  <body>
+    <h1>Archive</h1>
+    <ul class="postlist">
+      <li tal:repeat="post options/posts">
+        <a href="/posts/${post/number}.html" class="listtitle">${post/title}</a>
+        <span class="date">Post number ${post/number}</span>
+      </li>
+    </ul>
+  </body>
+</html>
+"""
+
+
+def archive_options(site):
+    return {
+        'posts': site.posts,
+        'pagekind': ['list', 'archive_page'],
+        'lang': 'en',
+    }
+
+
+def bench_render_to_string(loops, templates, output_name):
+    t0 = pyperf.perf_counter()
+    for _ in range(loops):
+        result = templates.render_template_to_string('archive.tmpl',
+                                                     archive_options(templates.site))
+        with open(output_name, 'wb') as f:
+            f.write(result.encode('utf-8'))
+        del result
+    return pyperf.perf_counter() - t0
+
+
+def bench_render_to_file(loops, templates, output_name):
+    t0 = pyperf.perf_counter()
+    for _ in range(loops):
+        templates.render_template_to_file('archive.tmpl', output_name,
+                                          archive_options(templates.site))
+    return pyperf.perf_counter() - t0
+
+
+def print_peaks(templates, output_name):
+    for bench in bench_render_to_string, bench_render_to_file:
+        tracemalloc.start()
+        try:
+            bench(1, templates, output_name)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        print("%s: %.1f kB" % (bench.__name__, peak / 1024))
+
+
+def main():
+    peak = '--peak' in sys.argv
+    runner = None if peak else pyperf.Runner()
+    template_dir = TemplateDirectory({'archive.tmpl.pt': ARCHIVE_TEMPLATE})
+    try:
+        templates = make_templates(MockSite.with_posts(ENTRIES), template_dir)
+        output_name = os.path.join(template_dir.root, 'output', 'archive.html')
+        # Compile before measuring.
+        bench_render_to_file(1, templates, output_name)
+        if peak:
+            print_peaks(templates, output_name)
+            return
+        runner.bench_time_func('render %d entry archive to string and write' % ENTRIES,
+                               bench_render_to_string,
+                               templates, output_name)
+        runner.bench_time_func('render %d entry archive to file' % ENTRIES,
+                               bench_render_to_file,
+                               templates, output_name)
+    finally:
+        template_dir.close()
+
+
+if __name__ == '__main__':
+    main()
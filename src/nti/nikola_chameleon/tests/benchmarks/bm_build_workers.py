@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark complete builds of the test site with 1, 4 and 8 worker
+processes (``nikola build -n N``), with the site configured to
+prepare templates before forking (``CHAMELEON_MULTIPROCESS``).
+
+Each build is a clean build in a copy of the test site, run in its
+own process.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import pyperf
+
+WORKERS = (1, 4, 8)
+
+TESTSITE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'testsite')
+
+
+def copy_site(multiprocess=True):
+    root = tempfile.mkdtemp(prefix='nti.nikola_chameleon.bm.')
+    site = os.path.join(root, 'site')
+    shutil.copytree(TESTSITE, site,
+                    ignore=shutil.ignore_patterns('output', 'cache', '.doit.db*'))
+    with open(os.path.join(site, 'conf.py'), 'a') as f:
+        f.write('\nCHAMELEON_MULTIPROCESS = %r\n' % (multiprocess,))
+    return root, site
+
+
+def clean_site(site):
+    for name in os.listdir(site):
+        if name in ('output', 'cache') or name.startswith('.doit.db'):
+            path = os.path.join(site, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+
+
+def bench_build(loops, site, workers):
+    command = [sys.executable, '-m', 'nikola', 'build', '--quiet']
+    if workers > 1:
+        command.extend(['-n', str(workers)])
+    duration = 0
+    for _ in range(loops):
+        clean_site(site)
+        t0 = pyperf.perf_counter()
+        subprocess.check_call(command, cwd=site,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        duration += pyperf.perf_counter() - t0
+    return duration
+
+
+def main():
+    runner = pyperf.Runner(values=3, processes=2)
+    root, site = copy_site()
+    try:
+        for workers in WORKERS:
+            runner.bench_time_func('build test site (%d workers)' % workers,
+                                   bench_build,
+                                   site, workers)
+    finally:
+        shutil.rmtree(root, True)
+
+
+if __name__ == '__main__':
+    main()
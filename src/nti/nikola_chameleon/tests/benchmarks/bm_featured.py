@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark the time to render each post as the number of posts
+in the site grows.
+
+Because the ``featured`` list is computed once per scan of the site,
+the time per post should stay flat.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import pyperf
+
+from nti.nikola_chameleon.tests import MockSite
+from nti.nikola_chameleon.tests.benchmarks import POST_TEMPLATE
+from nti.nikola_chameleon.tests.benchmarks import TemplateDirectory
+from nti.nikola_chameleon.tests.benchmarks import make_templates
+from nti.nikola_chameleon.tests.benchmarks import post_options
+
+POST_COUNTS = (100, 1000, 10000, 40000)
+
+#: How many posts we render per benchmark loop.
+RENDERED = 100
+
+
+def bench_render_posts(loops, templates, posts):
+    render = templates.render_template_to_string
+    t0 = pyperf.perf_counter()
+    for _ in range(loops):
+        for post in posts:
+            render('post.tmpl', post_options(post))
+    return pyperf.perf_counter() - t0
+
+
+def main():
+    runner = pyperf.Runner()
+    template_dir = TemplateDirectory({'post.tmpl.pt': POST_TEMPLATE})
+    try:
+        templates = make_templates(None, template_dir)
+        for count in POST_COUNTS:
+            site = templates.site = MockSite.with_posts(count)
+            runner.bench_time_func('render post (%d posts)' % count,
+                                   bench_render_posts,
+                                   templates,
+                                   site.posts[:RENDERED],
+                                   inner_loops=RENDERED)
+    finally:
+        template_dir.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark registering the macros of the bundled ``base-chameleon``
+theme and using each of them.
+
+The startup benchmark runs a new process with an empty compiled
+template cache for each loop, so it includes reading and compiling
+the macro files (and processing ``theme.zcml``). The lookup benchmark
+measures finding each registered macro again once the theme is
+loaded, as happens for each ``metal:use-macro``.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import subprocess
+import sys
+
+import pyperf
+
+from z3c.macro.interfaces import IMacroTemplate
+from zope import component
+
+from nti.nikola_chameleon.tests.benchmarks import TemplateDirectory
+from nti.nikola_chameleon.tests.benchmarks import make_templates
+
+BASE_THEME_TEMPLATES = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                                    'testsite', 'themes', 'base-chameleon', 'templates')
+
+
+def macro_factories():
+    return [
+        reg.factory
+        for reg in component.getGlobalSiteManager().registeredAdapters()
+        if reg.provided is IMacroTemplate
+    ]
+
+
+def use_macros(factories):
+    for factory in factories:
+        factory(None, None, None)
+
+
+def load_theme(template_dir):
+    templates = make_templates(None, template_dir)
+    templates._template_paths = [BASE_THEME_TEMPLATES] # pylint:disable=protected-access
+    templates._provide_templates() # pylint:disable=protected-access
+
+
+def startup_once():
+    # Runs in its own process; prints the time taken.
+    template_dir = TemplateDirectory({})
+    try:
+        t0 = pyperf.perf_counter()
+        load_theme(template_dir)
+        use_macros(macro_factories())
+        print(pyperf.perf_counter() - t0)
+    finally:
+        template_dir.close()
+
+
+def bench_startup(loops):
+    command = [sys.executable, os.path.abspath(__file__), '--startup-once']
+    duration = 0
+    for _ in range(loops):
+        duration += float(subprocess.check_output(command))
+    return duration
+
+
+def bench_lookup(loops, factories):
+    t0 = pyperf.perf_counter()
+    for _ in range(loops):
+        use_macros(factories)
+    return pyperf.perf_counter() - t0
+
+
+def main():
+    if '--startup-once' in sys.argv:
+        startup_once()
+        return
+
+    runner = pyperf.Runner()
+    runner.bench_time_func('register and use base-chameleon macros',
+                           bench_startup)
+
+    template_dir = TemplateDirectory({})
+    try:
+        load_theme(template_dir)
+        factories = macro_factories()
+        runner.bench_time_func('use each base-chameleon macro',
+                               bench_lookup,
+                               factories,
+                               inner_loops=len(factories))
+    finally:
+        template_dir.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmarks for each stage of the rendering pipeline.
+
+A small generated site (see :mod:`.sitegen`) is built in this process
+to get the template registrations and the contexts Nikola really
+passes for each kind of page. Then we measure:
+
+- rendering each kind of page again with ``render_template_to_string``;
+- finding a page's template with ``getViewTemplate``;
+- finding a macro with ``NamedMacroView.traverse`` (``@@macros``);
+- ``PostCssKindView.pagekind_class`` (``@@post_css``) for a post page;
+- translating a message with ``MessagesTranslate``;
+- ``Feeds.feed_translations_head`` for an index page;
+- ``HTMLFeedLinkViewlet.render`` for a tag page.
+
+Use ``--fast`` for a quicker, rougher run.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+
+import pyperf
+
+#: Enough posts for index pages to have more than one page.
+POSTS = 25
+
+
+def build_site(directory):
+    """
+    Build the site in *directory* in this process, returning the
+    :class:`.ChameleonTemplates` that rendered it and a dictionary
+    from each template name Nikola rendered to a copy of the first
+    context it was rendered with.
+    """
+    from nikola.__main__ import main
+    from nti.nikola_chameleon.plugin import ChameleonTemplates
+
+    contexts = {}
+    plugins = []
+    render_template = ChameleonTemplates.render_template
+
+    def capture(self, template_name, output_name, context):
+        if template_name not in contexts:
+            contexts[template_name] = dict(context)
+            plugins.append(self)
+        return render_template(self, template_name, output_name, context)
+
+    ChameleonTemplates.render_template = capture
+    cwd = os.getcwd()
+    try:
+        # Nikola reads conf.py from the current directory.
+        os.chdir(directory)
+        if main(['build', '--quiet']):
+            raise AssertionError("Build failed")
+    finally:
+        os.chdir(cwd)
+        ChameleonTemplates.render_template = render_template
+    return plugins[0], contexts
+
+
+def render(templates, name, context):
+    """
+    Render *name* with a copy of *context*, returning the options
+    as they were during rendering.
+    """
+    options = dict(context)
+    templates.render_template_to_string(name, options)
+    return options
+
+
+def bench_render(loops, templates, name, context):
+    render_template = templates.render_template_to_string
+    t0 = pyperf.perf_counter()
+    for _ in range(loops):
+        render_template(name, dict(context))
+    return pyperf.perf_counter() - t0
+
+
+def bench_get_view_template(loops, name, options):
+    from nti.nikola_chameleon.plugin import getViewTemplate
+    view = options['view']
+    request = view.request
+    context = options['context']
+    t0 = pyperf.perf_counter()
+    for _ in range(loops):
+        getViewTemplate(name, view, request, context)
+    return pyperf.perf_counter() - t0
+
+
+def bench_traverse_macro(loops, options, name):
+    from nti.nikola_chameleon.macro import NamedMacroView
+    request = options['view'].request
+    context = options['context']
+    t0 = pyperf.perf_counter()
+    for _ in range(loops):
+        NamedMacroView(context, request).traverse(name, None)
+    return pyperf.perf_counter() - t0
+
+
+def bench_pagekind_class(loops, options):
+    from nti.nikola_chameleon.view import PostCssKindView
+    view = PostCssKindView(options['context'], options['view'].request)
+    t0 = pyperf.perf_counter()
+    for _ in range(loops):
+        view.pagekind_class # pylint:disable=pointless-statement
+    return pyperf.perf_counter() - t0
+
+
+def bench_translate(loops, messages, msgids):
+    from nti.nikola_chameleon.template import MessagesTranslate
+    translate = MessagesTranslate(messages)
+    t0 = pyperf.perf_counter()
+    for _ in range(loops):
+        for msgid in msgids:
+            translate(msgid, target_language='en')
+    return pyperf.perf_counter() - t0
+
+
+def bench_feed_translations_head(loops, options):
+    from nti.nikola_chameleon.feeds import Feeds
+    feeds = Feeds(options['context'], options['view'].request)
+    t0 = pyperf.perf_counter()
+    for _ in range(loops):
+        feeds.feed_translations_head(classification=None, kind='index', other=False)
+    return pyperf.perf_counter() - t0
+
+
+def bench_feed_link_viewlet(loops, options):
+    from nti.nikola_chameleon.feeds import HTMLFeedLinkViewlet
+
+    class TagFeedLinkViewlet(HTMLFeedLinkViewlet):
+        classification_name = 'tag'
+
+    view = options['view']
+    viewlet = TagFeedLinkViewlet(options['context'], view.request, view, None)
+    t0 = pyperf.perf_counter()
+    for _ in range(loops):
+        viewlet.render()
+    return pyperf.perf_counter() - t0
+
+
+def main():
+    from nti.nikola_chameleon.tests.benchmarks.sitegen import generate_site
+
+    runner = pyperf.Runner()
+    root = tempfile.mkdtemp(prefix='nti.nikola_chameleon.bm.')
+    try:
+        site = os.path.join(root, 'site')
+        # The text of posts is read from the cache folder when they
+        # are rendered, so it must not depend on the current directory.
+        generate_site(site, POSTS,
+                      galleries=1, listings=1, shortcodes=2, math=2,
+                      CACHE_FOLDER=os.path.join(site, 'cache'),
+                      OUTPUT_FOLDER=os.path.join(site, 'output'))
+        templates, contexts = build_site(site)
+
+        for name, context in sorted(contexts.items()):
+            runner.bench_time_func('render %s' % name,
+                                   bench_render,
+                                   templates, name, context)
+
+        post_options = render(templates, 'post.tmpl', contexts['post.tmpl'])
+        runner.bench_time_func('getViewTemplate post.tmpl',
+                               bench_get_view_template,
+                               'post.tmpl', post_options)
+        runner.bench_time_func('NamedMacroView.traverse comment_link',
+                               bench_traverse_macro,
+                               post_options, 'comment_link')
+        runner.bench_time_func('PostCssKindView.pagekind_class',
+                               bench_pagekind_class,
+                               post_options)
+
+        msgids = ['Read more', 'Source', 'Older posts', 'Not a message']
+        runner.bench_time_func('MessagesTranslate',
+                               bench_translate,
+                               templates.site.MESSAGES, msgids,
+                               inner_loops=len(msgids))
+
+        index_options = render(templates, 'index.tmpl', contexts['index.tmpl'])
+        runner.bench_time_func('Feeds.feed_translations_head',
+                               bench_feed_translations_head,
+                               index_options)
+
+        tag_options = render(templates, 'tag.tmpl', contexts['tag.tmpl'])
+        runner.bench_time_func('HTMLFeedLinkViewlet.render',
+                               bench_feed_link_viewlet,
+                               tag_options)
+    finally:
+        shutil.rmtree(root, True)
+
+
+if __name__ == '__main__':
+    main()
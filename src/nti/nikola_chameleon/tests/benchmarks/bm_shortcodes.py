@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark rendering a post that uses a shortcode template hundreds of
+times.
+
+Nikola identifies shortcode templates by their contents. For a
+shortcode in the ``shortcodes/`` directory it passes the same string
+each time; for the ``template`` shortcode it passes a new string each
+time, which we simulate with copies.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+
+import pyperf
+
+from nti.nikola_chameleon.tests import MockPost
+from nti.nikola_chameleon.tests import MockSite
+from nti.nikola_chameleon.tests.benchmarks import TemplateDirectory
+from nti.nikola_chameleon.tests.benchmarks import make_templates
+
+#: How many times the post uses the shortcode.
+INVOCATIONS = 500
+
+#: A shortcode of a realistic size.
+SHORTCODE_TEMPLATE = u"""
+<figure class="shortcode">
+  <p>${options/caption}</p>
+  %s
+</figure>
+""" % (u'<!-- Some commentary about this shortcode. -->\n' * 40)
+
+
+def shortcode_options(post):
+    # What Nikola's render_shortcode passes, minus most of the
+    # global context.
+    return {
+        'post': post,
+        'lang': 'en',
+        'caption': u'A caption',
+        '_args': (),
+        'site_has_comments': False,
+    }
+
+
+def bench_render_shortcodes(loops, templates, contents, post):
+    render = templates.render_template_to_string
+    t0 = pyperf.perf_counter()
+    for _ in range(loops):
+        for text in contents:
+            render(text, shortcode_options(post))
+    return pyperf.perf_counter() - t0
+
+
+def main():
+    runner = pyperf.Runner()
+    template_dir = TemplateDirectory({})
+    try:
+        shortcode_dir = template_dir.template_dir
+        with open(os.path.join(shortcode_dir, 'figure.tmpl'), 'w') as f:
+            f.write(SHORTCODE_TEMPLATE)
+        with open(os.path.join(shortcode_dir, 'figure.tmpl'), 'r') as f:
+            contents = f.read()
+
+        templates = make_templates(MockSite.with_posts(10), template_dir)
+        templates._shortcode_paths = [shortcode_dir] # pylint:disable=protected-access
+        post = MockPost(number=1)
+
+        runner.bench_time_func('render %d file shortcodes' % INVOCATIONS,
+                               bench_render_shortcodes,
+                               templates,
+                               [contents] * INVOCATIONS,
+                               post,
+                               inner_loops=INVOCATIONS)
+        copies = [u''.join(list(contents)) for _ in range(INVOCATIONS)]
+        runner.bench_time_func('render %d template shortcodes' % INVOCATIONS,
+                               bench_render_shortcodes,
+                               templates,
+                               copies,
+                               post,
+                               inner_loops=INVOCATIONS)
+    finally:
+        template_dir.close()
+
+
+if __name__ == '__main__':
+    main()
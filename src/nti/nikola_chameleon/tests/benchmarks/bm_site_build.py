@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark complete builds of generated sites (see :mod:`.sitegen`)
+with 1,000, 10,000 and 100,000 posts, to show how building scales
+with the size of the site.
+
+The sites have one tag for every 20 posts, 10 authors, a shortcode in
+one post of every 10 and math in one of every 20, and a few galleries
+and listings. Each build is a clean build, run in its own process.
+Large sites take a long time to build; choose the sizes to run with
+``--posts``, and the theme with ``--theme``::
+
+    python -m nti.nikola_chameleon.tests.benchmarks.bm_site_build --posts 1000 --posts 10000
+
+Each site is generated the first time it is needed, in a temporary
+directory that is removed at the end.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import atexit
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import pyperf
+
+from nti.nikola_chameleon.tests.benchmarks.bm_build_workers import clean_site
+from nti.nikola_chameleon.tests.benchmarks.sitegen import THEMES
+from nti.nikola_chameleon.tests.benchmarks.sitegen import generate_site
+
+POST_COUNTS = (1000, 10000, 100000)
+
+#: {(posts, theme): site directory} for the sites generated in this process.
+_SITES = {}
+
+
+def site_with(posts, theme):
+    site = _SITES.get((posts, theme))
+    if site is None:
+        root = tempfile.mkdtemp(prefix='nti.nikola_chameleon.bm.')
+        atexit.register(shutil.rmtree, root, True)
+        site = _SITES[(posts, theme)] = generate_site(
+            os.path.join(root, 'site'), posts,
+            tags=max(posts // 20, 1),
+            authors=10,
+            galleries=3,
+            listings=3,
+            shortcodes=posts // 10,
+            math=posts // 20,
+            theme=theme)
+    return site
+
+
+def bench_build(loops, posts, theme):
+    site = site_with(posts, theme)
+    command = [sys.executable, '-m', 'nikola', 'build', '--quiet']
+    duration = 0
+    for _ in range(loops):
+        clean_site(site)
+        t0 = pyperf.perf_counter()
+        subprocess.check_call(command, cwd=site,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        duration += pyperf.perf_counter() - t0
+    return duration
+
+
+def add_cmdline_args(cmd, args):
+    for posts in args.posts or ():
+        cmd.extend(('--posts', str(posts)))
+    cmd.extend(('--theme', args.theme))
+
+
+def main():
+    runner = pyperf.Runner(values=3, processes=2, add_cmdline_args=add_cmdline_args)
+    runner.argparser.add_argument('--posts', type=int, action='append',
+                                  help='Build a site with this many posts. '
+                                  'Can be repeated. Default: %s' % (POST_COUNTS,))
+    runner.argparser.add_argument('--theme', choices=THEMES, default='clean-blog',
+                                  help='Default: %(default)s')
+    args = runner.parse_args()
+    for posts in args.posts or POST_COUNTS:
+        runner.bench_time_func('build %s site with %d posts' % (args.theme, posts),
+                               bench_build,
+                               posts, args.theme)
+
+
+if __name__ == '__main__':
+    main()
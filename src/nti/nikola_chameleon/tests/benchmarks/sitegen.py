@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Generating large Nikola sites, for benchmarks and scale testing.
+
+A generated site has the configuration, plugins, shortcodes and
+themes of the test site, and as many posts, tags, authors,
+galleries and listings as requested. Some of the posts use a
+shortcode, and some use math. Posts are written in HTML, so that
+building the site spends its time in templates, not in a markup
+compiler.
+
+This can also be run to generate a site to build by hand::
+
+    python -m nti.nikola_chameleon.tests.benchmarks.sitegen /tmp/site --posts 10000
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import io
+import os
+import shutil
+
+TESTSITE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'testsite')
+
+#: What we copy from the test site.
+SITE_FILES = ('conf.py', 'plugins', 'shortcodes', 'themes')
+
+#: The themes bundled with the test site.
+THEMES = ('base-chameleon', 'bootstrap3-chameleon', 'clean-blog')
+
+#: The images each gallery has.
+GALLERY_IMAGES = ('tesla2_lg.jpg', 'tesla_conducts_lg.jpg', 'tesla_tower1_lg.jpg')
+
+POST_TEMPLATE = u"""<!--
+.. title: Post %(number)d
+.. slug: post-%(number)d
+.. date: %(date)s
+.. tags: %(tags)s
+.. category: %(category)s
+.. author: %(author)s
+.. has_math: %(has_math)s
+-->
+<p>This is post number %(number)d.</p>
+<!-- TEASER_END -->
+<p>%(body)s</p>
+%(extra)s
+"""
+
+BODY = u' '.join([u'Lorem ipsum dolor sit amet, consectetur adipiscing elit.'] * 20)
+
+#: Added to the posts that use a shortcode (from the test site).
+SHORTCODE = u'<p>{{% nti %}}</p>'
+
+#: Added to the posts that use math.
+MATH = u'<p>Euler says \\(e^{i\\pi} + 1 = 0\\).</p>'
+
+GALLERY_TEMPLATE = u""".. title: Gallery %(number)d
+
+Gallery number %(number)d.
+"""
+
+LISTING_TEMPLATE = u'''# -*- coding: utf-8 -*-
+"""
+Listing number %(number)d.
+"""
+
+def listing_%(number)d(arg):
+    return [arg * i for i in range(%(number)d)]
+'''
+
+
+def every(count, total):
+    """
+    Return the set of *count* numbers spread evenly through
+    ``range(total)``.
+    """
+    if not count:
+        return frozenset()
+    return frozenset(range(0, total, max(total // count, 1))[:count])
+
+
+def post_text(number, tags=20, authors=5, shortcode=False, math=False):
+    """
+    Return the source of post *number* in a site using *tags* tags
+    and *authors* authors.
+    """
+    extra = []
+    if shortcode:
+        extra.append(SHORTCODE)
+    if math:
+        extra.append(MATH)
+    return POST_TEMPLATE % {
+        'number': number,
+        # One post a day, going back from 2018.
+        'date': u'%04d-%02d-%02d 12:00:00 UTC' % (2018 - number // 336,
+                                                  12 - number // 28 % 12,
+                                                  28 - number % 28),
+        'tags': u', '.join(u'tag%d' % ((number + i) % tags) for i in range(min(tags, 3))),
+        'category': u'category%d' % (number % 5),
+        'author': u'Author %d' % (number % authors) if authors else u'',
+        'has_math': u'true' if math else u'',
+        'body': BODY,
+        'extra': u'\n'.join(extra),
+    }
+
+
+def _write(path, text):
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    with io.open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def generate_site(directory, posts=100, tags=20, authors=5,
+                  galleries=0, listings=0, shortcodes=0, math=0,
+                  theme='clean-blog', **config):
+    """
+    Create a new site in *directory* (which must not exist) and
+    return *directory*.
+
+    The site has *posts* posts, using *tags* tags and written by
+    *authors* authors. *shortcodes* of the posts use a shortcode and
+    *math* of them use math. There are *galleries* galleries of a few
+    images each, and *listings* code listings. It uses the *theme*
+    (one of :data:`THEMES`), and the other keyword arguments are
+    added to its ``conf.py``.
+    """
+    if theme not in THEMES:
+        raise ValueError("Unknown theme", theme)
+    os.makedirs(directory)
+    for name in SITE_FILES:
+        source = os.path.join(TESTSITE, name)
+        if os.path.isdir(source):
+            shutil.copytree(source, os.path.join(directory, name))
+        else:
+            shutil.copy(source, directory)
+
+    with_shortcodes = every(shortcodes, posts)
+    with_math = every(math, posts)
+    for number in range(posts):
+        _write(os.path.join(directory, 'posts', 'post-%d.html' % number),
+               post_text(number, tags, authors,
+                         number in with_shortcodes, number in with_math))
+
+    for number in range(galleries):
+        gallery = os.path.join(directory, 'galleries', 'gallery-%d' % number)
+        _write(os.path.join(gallery, 'index.txt'), GALLERY_TEMPLATE % {'number': number})
+        for image in GALLERY_IMAGES:
+            shutil.copy(os.path.join(TESTSITE, 'galleries', 'demo', image), gallery)
+
+    for number in range(listings):
+        _write(os.path.join(directory, 'listings', 'listing-%d.py' % number),
+               LISTING_TEMPLATE % {'number': number})
+
+    config['THEME'] = theme
+    with open(os.path.join(directory, 'conf.py'), 'a') as f:
+        f.write('\n')
+        for name, value in sorted(config.items()):
+            f.write('%s = %r\n' % (name, value))
+    return directory
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a Nikola site.")
+    parser.add_argument('directory')
+    for name, default in (('posts', 100), ('tags', 20), ('authors', 5),
+                          ('galleries', 0), ('listings', 0),
+                          ('shortcodes', 0), ('math', 0)):
+        parser.add_argument('--' + name, type=int, default=default,
+                            help='Default: %(default)s')
+    parser.add_argument('--theme', choices=THEMES, default='clean-blog',
+                        help='Default: %(default)s')
+    args = parser.parse_args(argv)
+    generate_site(**vars(args))
+
+
+if __name__ == '__main__':
+    main()
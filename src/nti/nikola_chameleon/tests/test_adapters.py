@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for adapters.py
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+
+# disable: accessing protected members, too many methods
+# pylint: disable=W0212,R0904
+
+import gc
+import unittest
+
+from hamcrest import assert_that
+from hamcrest import has_length
+from hamcrest import is_
+from hamcrest import is_not
+from hamcrest import same_instance
+
+from nikola.utils import LocaleBorg
+
+from zope import interface
+from zope.testing.cleanup import CleanUp
+
+from .. import adapters
+from .. import interfaces
+from ..adapters import FormattedDatePathAdapter
+from ..adapters import MetaPathAdapter
+from ..adapters import formatted_date_path_adapter
+from ..adapters import meta_path_adapter
+
+
+@interface.implementer(interfaces.IPost)
+class _Post(object):
+
+    def __init__(self):
+        self.calls = []
+
+    def meta(self, key, lang=None):
+        lang = lang or LocaleBorg().current_lang
+        self.calls.append(('meta', key, lang))
+        return u'%s %s' % (key, lang)
+
+    def formatted_date(self, date_format):
+        lang = LocaleBorg().current_lang
+        self.calls.append(('formatted_date', date_format, lang))
+        return u'%s %s' % (date_format, lang)
+
+
+class TestPostPathAdapters(CleanUp,
+                           unittest.TestCase):
+
+    def setUp(self):
+        super(TestPostPathAdapters, self).setUp()
+        LocaleBorg.initialize({}, 'en')
+
+    def tearDown(self):
+        LocaleBorg.reset()
+        super(TestPostPathAdapters, self).tearDown()
+
+    def test_adapter_reused(self):
+        post = _Post()
+        meta = meta_path_adapter(post)
+        assert_that(meta, is_(MetaPathAdapter))
+        assert_that(meta_path_adapter(post), is_(same_instance(meta)))
+        assert_that(meta.context, is_(same_instance(post)))
+        assert_that(formatted_date_path_adapter(post),
+                    is_(FormattedDatePathAdapter))
+        assert_that(meta_path_adapter(_Post()), is_not(same_instance(meta)))
+
+        adapters.clear()
+        assert_that(meta_path_adapter(post), is_not(same_instance(meta)))
+
+    def test_posts_not_kept(self):
+        post = _Post()
+        meta_path_adapter(post)
+        assert_that(adapters._POST_ADAPTERS, has_length(1))
+        del post
+        gc.collect()
+        assert_that(adapters._POST_ADAPTERS, has_length(0))
+
+    def test_values_cached_per_language(self):
+        post = _Post()
+        for _ in range(2):
+            assert_that(meta_path_adapter(post).traverse('title', None),
+                        is_(u'title en'))
+            assert_that(formatted_date_path_adapter(post).traverse('webiso', None),
+                        is_(u'webiso en'))
+        LocaleBorg().set_locale('es')
+        assert_that(meta_path_adapter(post).traverse('title', None),
+                    is_(u'title es'))
+        assert_that(post.calls, is_([
+            ('meta', 'title', 'en'),
+            ('formatted_date', 'webiso', 'en'),
+            ('meta', 'title', 'es'),
+        ]))
+
+        adapters.clear()
+        meta_path_adapter(post).traverse('title', None)
+        assert_that(post.calls[-1], is_(('meta', 'title', 'es')))
+        assert_that(post.calls, has_length(4))
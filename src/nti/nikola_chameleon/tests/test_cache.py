@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for cache.py
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+
+# disable: accessing protected members, too many methods
+# pylint: disable=W0212,R0904
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from hamcrest import assert_that
+from hamcrest import contains
+from hamcrest import contains_string
+from hamcrest import has_length
+from hamcrest import is_
+from hamcrest import is_not as does_not
+
+from zope.testing.cleanup import CleanUp
+
+TEMPLATE = u'<p>${options/message}</p>'
+
+
+class TestCompiledTemplateCache(CleanUp,
+                                unittest.TestCase):
+
+    def setUp(self):
+        super(TestCompiledTemplateCache, self).setUp()
+        self.root = tempfile.mkdtemp(prefix='nti.nikola_chameleon.tests.')
+        self.cache_dir = os.path.join(self.root, 'cache')
+        os.makedirs(self.cache_dir)
+        from chameleon import template as template_mod
+        self._orig_loader = template_mod.BaseTemplate.loader
+
+    def tearDown(self):
+        from chameleon import template as template_mod
+        template_mod.BaseTemplate.loader = self._orig_loader
+        shutil.rmtree(self.root, True)
+        super(TestCompiledTemplateCache, self).tearDown()
+
+    def _makeOne(self, max_size=None):
+        from chameleon import template as template_mod
+        from ..cache import CompiledTemplateCache
+        loader = CompiledTemplateCache(self.cache_dir)
+        if max_size is not None:
+            loader.max_size = max_size
+        template_mod.BaseTemplate.loader = loader
+        return loader
+
+    def _write_template(self, directory, name='page.tmpl', text=TEMPLATE):
+        directory = os.path.join(self.root, directory)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        path = os.path.join(directory, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def _cook(self, path):
+        from ..template import NikolaPageFileTemplate
+        template = NikolaPageFileTemplate(path)
+        template.cook_check()
+        return template
+
+    def _modules(self):
+        return sorted(n for n in os.listdir(self.cache_dir) if n.endswith('.py'))
+
+    def test_digest_independent_of_location(self):
+        self._makeOne()
+        self._cook(self._write_template('checkout1'))
+        modules = self._modules()
+        assert_that(modules, has_length(1))
+
+        # The same theme checked out somewhere else uses the same
+        # compiled module.
+        self._cook(self._write_template('checkout2'))
+        assert_that(self._modules(), is_(modules))
+
+        # But different contents don't
+        self._cook(self._write_template('checkout3', text=TEMPLATE + u'<br />'))
+        assert_that(self._modules(), has_length(2))
+
+    def test_errors_report_own_filename(self):
+        from chameleon.zpt.template import PageTemplateFile
+        self._makeOne()
+        text = u'<p>${options/missing}</p>'
+        first = self._cook(self._write_template('checkout1', text=text))
+        second = self._cook(self._write_template('checkout2', text=text))
+        assert_that(self._modules(), has_length(1))
+
+        for template in first, second:
+            with self.assertRaises(Exception) as exc:
+                # Without the view machinery
+                PageTemplateFile.render(template, options={})
+            assert_that(str(exc.exception), contains_string(template.filename))
+            other = (first if template is second else second).filename
+            assert_that(str(exc.exception), does_not(contains_string(other)))
+
+    def test_get_updates_access_time(self):
+        loader = self._makeOne()
+        self._cook(self._write_template('checkout1'))
+        module, = self._modules()
+        path = os.path.join(self.cache_dir, module)
+        os.utime(path, (0, 1000))
+
+        assert_that(loader.get(module), does_not(None))
+        stat = os.stat(path)
+        assert_that(stat.st_mtime, is_(1000))
+        assert_that(stat.st_atime > 1000, is_(True))
+
+    def test_evict_least_recently_used(self):
+        from ..cache import CompiledTemplateCache
+        self._makeOne()
+        for i in range(3):
+            self._cook(self._write_template('checkout',
+                                            name='page%d.tmpl' % i,
+                                            text=TEMPLATE * (i + 1)))
+        modules = self._modules()
+        assert_that(modules, has_length(3))
+        # page0 is the oldest, page2 the newest, page1 used by
+        # the (new) process.
+        for i, module in enumerate(modules):
+            os.utime(os.path.join(self.cache_dir, module), (i * 1000, i * 1000))
+
+        loader = CompiledTemplateCache(self.cache_dir, max_size=0)
+        loader._used.add(os.path.splitext(modules[1])[0])
+        removed = loader.evict()
+        assert_that(removed, contains(os.path.splitext(modules[0])[0],
+                                      os.path.splitext(modules[2])[0]))
+        assert_that(self._modules(), contains(modules[1]))
+
+    def test_evict_under_max_size(self):
+        loader = self._makeOne()
+        self._cook(self._write_template('checkout1'))
+        assert_that(loader.evict(), is_([]))
+        assert_that(self._modules(), has_length(1))
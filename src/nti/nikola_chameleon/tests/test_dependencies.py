@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for dependencies.py
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+
+# disable: accessing protected members, too many methods
+# pylint: disable=W0212,R0904
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+
+from hamcrest import assert_that
+from hamcrest import contains
+from hamcrest import contains_inanyorder
+from hamcrest import is_
+
+
+class TestRecording(unittest.TestCase):
+
+    def test_nested(self):
+        from ..dependencies import record
+        from ..dependencies import recording
+
+        record('ignored')
+        with recording() as outer:
+            record('outer')
+            with recording() as inner:
+                record('inner')
+        record('ignored')
+
+        assert_that(outer, contains_inanyorder('outer', 'inner'))
+        assert_that(inner, contains('inner'))
+
+
+class TestDependencyGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='nti.nikola_chameleon.tests.')
+        self.path = os.path.join(self.root, 'deps.json')
+        self.files = []
+        for name in ('a.pt', 'b.pt', 'c.pt'):
+            fname = os.path.join(self.root, name)
+            with open(fname, 'w'):
+                pass
+            self.files.append(fname)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, True)
+
+    def _makeOne(self, path=None):
+        from ..dependencies import DependencyGraph
+        return DependencyGraph(path)
+
+    def test_in_memory(self):
+        graph = self._makeOne()
+        graph.add('post.tmpl', {self.files[1], self.files[0]})
+        assert_that(graph.get('post.tmpl'), is_(self.files[:2]))
+        assert_that(graph.get('index.tmpl'), is_([]))
+
+    def test_saved_and_merged(self):
+        a, b, c = self.files
+        graph1 = self._makeOne(self.path)
+        graph2 = self._makeOne(self.path)
+
+        graph1.add('post.tmpl', {a})
+        graph2.add('post.tmpl', {b})
+        graph2.add('index.tmpl', {c})
+
+        graph = self._makeOne(self.path)
+        assert_that(graph.get('post.tmpl'), is_([a, b]))
+        assert_that(graph.get('index.tmpl'), is_([c]))
+
+    def test_missing_files_ignored(self):
+        a, b, _ = self.files
+        graph = self._makeOne(self.path)
+        graph.add('post.tmpl', {a, b})
+        os.remove(a)
+        assert_that(self._makeOne(self.path).get('post.tmpl'), is_([b]))
+
+    def test_corrupt_file(self):
+        with open(self.path, 'w') as f:
+            f.write('{')
+        graph = self._makeOne(self.path)
+        assert_that(graph.get('post.tmpl'), is_([]))
+
+    @unittest.skipUnless(hasattr(os, 'fork'), "Needs fork")
+    def test_concurrent_saves(self):
+        # Workers building at the same time keep each other's changes.
+        a = self.files[0]
+        workers = [multiprocessing.Process(target=_add_names,
+                                           args=(self.path, a, worker))
+                   for worker in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+            assert_that(worker.exitcode, is_(0))
+
+        graph = self._makeOne(self.path)
+        for worker in range(4):
+            for i in range(_NAMES):
+                assert_that(graph.get('%d-%d.tmpl' % (worker, i)), is_([a]))
+
+
+_NAMES = 25
+
+
+def _add_names(path, filename, worker):
+    from ..dependencies import DependencyGraph
+    graph = DependencyGraph(path)
+    for i in range(_NAMES):
+        graph.add('%d-%d.tmpl' % (worker, i), {filename})
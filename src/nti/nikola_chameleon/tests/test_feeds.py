@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for feeds.py
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+
+# disable: accessing protected members, too many methods
+# pylint: disable=W0212,R0904
+
+import unittest
+
+from hamcrest import assert_that
+from hamcrest import has_length
+from hamcrest import is_
+
+from z3c.pt.pagetemplate import ViewPageTemplate
+
+from ..feeds import Feeds
+from ..feeds import HTMLFeedLinkViewlet
+from ..request import Request
+from . import MockView
+
+
+class _TagFeedLinkViewlet(HTMLFeedLinkViewlet):
+    classification_name = 'tag'
+
+
+# The templates the fragments replace.
+HEAD_FEED_LINK = ViewPageTemplate("""
+    <link rel="alternate" type="${options/link_type}"
+          title="${options/link_name}" hreflang="${options/language}"
+          href="${options/href}">
+    """)
+
+HTML_FEED_LINK = ViewPageTemplate("""
+    <a type="${options/link_type}"
+          title="${options/link_name}" hreflang="${options/language}"
+          href="${options/href}"
+    >
+    ${options/text}${options/extra}
+    </a>
+    """)
+
+
+class TestFeedLinks(unittest.TestCase):
+
+    tag = u'Rock & "Roll" <3'
+
+    def setUp(self):
+        self.links = []
+        self.options = {
+            '_link': self._link,
+            'messages': lambda msgid, lang: msgid.upper(),
+            'translations': {'en': ''},
+            'generate_rss': True,
+            'generate_atom': True,
+            'rss_link': None,
+            'tag': self.tag,
+            'kind': 'tag',
+            'view': MockView(),
+        }
+        self.request = Request(None, self.options)
+
+    def _link(self, kind, classification, lang):
+        self.links.append((kind, classification, lang))
+        return u'/%s/%s?a=1&b=2' % (kind, classification)
+
+    def _render(self, template, **options):
+        return template(context=object(), request=self.request, **options)
+
+    def test_head_same_as_template(self):
+        feeds = Feeds(None, self.request)
+        expected = u''.join(
+            self._render(HEAD_FEED_LINK,
+                         link_type=link_type,
+                         link_name=link_name + u' for tag ' + self.tag,
+                         language=u'en',
+                         href=self._link(kind, self.tag, 'en'))
+            for link_type, link_name, kind in (('application/rss+xml', u'RSS', 'tag_rss'),
+                                               ('application/atom+xml', u'Atom', 'tag_atom')))
+
+        assert_that(feeds.feed_translations_head(self.tag, 'tag'), is_(expected))
+
+    def test_viewlet_same_as_template(self):
+        viewlet = _TagFeedLinkViewlet(None, self.request, None, None)
+        expected = [
+            self._render(HTML_FEED_LINK,
+                         link_type=link_type,
+                         link_name=link_name,
+                         language=u'en',
+                         href=self._link(kind, self.tag, 'en'),
+                         text=link_name.upper(),
+                         extra=u' (%s)' % (self.tag,))
+            for link_type, link_name, kind in (('application/atom+xml', u'Atom feed', 'tag_atom'),
+                                               ('application/rss+xml', u'RSS feed', 'tag_rss'))]
+        assert_that(viewlet._html_feed_link('application/atom+xml', u'Atom feed', 'atom',
+                                            self.tag, 'tag', 'en', name=self.tag),
+                    is_(expected[0]))
+        assert_that(viewlet._html_feed_link('application/rss+xml', u'RSS feed', 'rss',
+                                            self.tag, 'tag', 'en', name=self.tag),
+                    is_(expected[1]))
+
+    def test_rendered_once(self):
+        feeds = Feeds(None, self.request)
+        viewlet = _TagFeedLinkViewlet(None, self.request, None, None)
+        head = feeds.feed_translations_head(self.tag, 'tag')
+        html = viewlet.render()
+        assert_that(self.links, is_([('tag_rss', self.tag, 'en'),
+                                     ('tag_atom', self.tag, 'en'),
+                                     ('tag_atom', self.tag, 'en'),
+                                     ('tag_rss', self.tag, 'en')]))
+        del self.links[:]
+
+        assert_that(feeds.feed_translations_head(self.tag, 'tag'), is_(head))
+        assert_that(viewlet.render(), is_(html))
+        assert_that(self.links, is_([]))
+
+        # Until the site is scanned again.
+        self.options['view'].templates.feed_links.clear()
+        feeds.feed_translations_head(self.tag, 'tag')
+        assert_that(self.links, has_length(2))
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for macro.py
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+
+# disable: accessing protected members, too many methods
+# pylint: disable=W0212,R0904
+
+import os
+import unittest
+
+from hamcrest import assert_that
+from hamcrest import has_length
+from hamcrest import instance_of
+from hamcrest import is_
+from hamcrest import same_instance
+
+from z3c.macro.interfaces import IMacroTemplate
+
+from zope import component
+from zope import interface
+from zope.testing.cleanup import CleanUp
+
+from ..dependencies import recording
+from ..macro import MACRO_FACTORIES
+from ..macro import MacroFactory
+from ..macro import NamedMacroView
+from ..request import Request
+from . import MockView
+from .test_plugin import BASE_THEME_TEMPLATES
+
+
+class TestMacroFactory(CleanUp,
+                       unittest.TestCase):
+
+    def _factories(self, path):
+        return [
+            reg.factory
+            for reg in component.getGlobalSiteManager().registeredAdapters()
+            if reg.provided is IMacroTemplate and reg.factory.path == path
+        ]
+
+    def _provide_base_templates(self):
+        from ..plugin import ChameleonTemplates
+        templates = ChameleonTemplates()
+        templates._template_paths = [BASE_THEME_TEMPLATES]
+        templates._shortcode_paths = []
+        templates._provide_templates()
+
+    def test_one_template_per_file(self):
+        self._provide_base_templates()
+
+        # Registered for each macro in the file, and by theme.zcml
+        path = os.path.join(BASE_THEME_TEMPLATES, 'base.macro.pt')
+        factories = self._factories(path)
+        assert_that(len(factories) > 1, is_(True))
+        template = factories[0].template
+        for factory in factories:
+            assert_that(factory.template, is_(same_instance(template)))
+            factory(None, None, None)
+        assert_that(template._cooked, is_(True))
+
+        # Including those registered by the z3c:macro directive.
+        path = os.path.join(BASE_THEME_TEMPLATES, 'archive_navigation_helper.macro.pt')
+        factories = self._factories(path)
+        assert_that(factories, has_length(3))
+        assert_that({id(f.template) for f in factories}, has_length(1))
+        for factory in factories:
+            assert_that(factory, is_(instance_of(MacroFactory)))
+
+    def test_macro_kept(self):
+        self._provide_base_templates()
+        path = os.path.join(BASE_THEME_TEMPLATES, 'base.macro.pt')
+        factory = self._factories(path)[0]
+        macro = factory(None, None, None)
+        with recording() as files:
+            assert_that(factory(None, None, None), is_(same_instance(macro)))
+        # Still a dependency of what is using it.
+        assert_that(files, is_({path}))
+
+
+class TestNamedMacroView(CleanUp,
+                         unittest.TestCase):
+
+    def setUp(self):
+        super(TestNamedMacroView, self).setUp()
+        self.found = []
+
+        def factory(context, view, request):
+            self.found.append(context)
+            return self.macro
+
+        self.macro = object()
+        component.getGlobalSiteManager().registerAdapter(
+            factory,
+            required=(interface.Interface,) * 3,
+            provided=IMacroTemplate,
+            name='a_macro')
+
+    def test_cached_and_rebound(self):
+        request = Request(None, {'view': MockView()})
+        first, second = object(), object()
+        misses = MACRO_FACTORIES.misses
+
+        bound = NamedMacroView(first, request).traverse('a_macro', None)
+        assert_that(bound.func, is_(same_instance(self.macro)))
+        assert_that(bound.context, is_(same_instance(first)))
+
+        bound = NamedMacroView(second, request).traverse('a_macro', None)
+        assert_that(bound.func, is_(same_instance(self.macro)))
+        assert_that(bound.context, is_(same_instance(second)))
+
+        assert_that(MACRO_FACTORIES.misses - misses, is_(1))
+        assert_that(self.found, is_([first, second]))
+
+    def test_not_found(self):
+        with self.assertRaises(component.ComponentLookupError):
+            NamedMacroView(object(), Request(None, {'view': MockView()})).traverse('no_macro', None)
+
+    def test_registered_after_miss(self):
+        request = Request(None, {'view': MockView()})
+        with self.assertRaises(component.ComponentLookupError):
+            NamedMacroView(object(), request).traverse('new_macro', None)
+
+        macro = object()
+        component.provideAdapter(lambda *args: macro,
+                                 adapts=(interface.Interface,) * 3,
+                                 provides=IMacroTemplate,
+                                 name='new_macro')
+        bound = NamedMacroView(object(), request).traverse('new_macro', None)
+        assert_that(bound.func, is_(same_instance(macro)))
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for outputs.py
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+
+# disable: accessing protected members, too many methods
+# pylint: disable=W0212,R0904
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+
+from hamcrest import assert_that
+from hamcrest import has_length
+from hamcrest import is_
+
+
+class TestWriteIfChanged(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='nti.nikola_chameleon.tests.')
+        self.manifest = os.path.join(self.root, 'outputs.log')
+        self.filename = os.path.join(self.root, 'page.html')
+
+    def tearDown(self):
+        shutil.rmtree(self.root, True)
+
+    def _digests(self):
+        from ..outputs import OutputDigests
+        return OutputDigests(self.manifest)
+
+    def _callFUT(self, text, digests=None):
+        from ..outputs import write_if_changed
+        return write_if_changed(self.filename, digests or self._digests(),
+                                lambda f: f.write(text))
+
+    def _contents(self):
+        with open(self.filename, 'rb') as f:
+            return f.read()
+
+    def test_writes_only_changes(self):
+        assert_that(self._callFUT(u'☃'), is_(True))
+        assert_that(self._contents(), is_(u'☃'.encode('utf-8')))
+        mtime = os.stat(self.filename).st_mtime_ns
+
+        # Same contents, new manifest object: not written.
+        assert_that(self._callFUT(u'☃'), is_(False))
+        assert_that(os.stat(self.filename).st_mtime_ns, is_(mtime))
+
+        assert_that(self._callFUT(u'changed'), is_(True))
+        assert_that(self._contents(), is_(b'changed'))
+        # No temporary files are left behind.
+        assert_that(sorted(os.listdir(self.root)),
+                    is_(['outputs.log', 'outputs.log.lock', 'page.html']))
+
+    def test_rewrites_modified_file(self):
+        digests = self._digests()
+        self._callFUT(u'text', digests)
+        os.remove(self.filename)
+        assert_that(self._callFUT(u'text', digests), is_(True))
+
+        with open(self.filename, 'w') as f:
+            f.write('edited')
+        assert_that(self._callFUT(u'text', digests), is_(True))
+        assert_that(self._contents(), is_(b'text'))
+
+    def test_keeps_mode(self):
+        self._callFUT(u'text')
+        os.chmod(self.filename, 0o640)
+        self._callFUT(u'changed')
+        assert_that(os.stat(self.filename).st_mode & 0o777, is_(0o640))
+
+    def test_error_leaves_file(self):
+        from ..outputs import write_if_changed
+        self._callFUT(u'text')
+
+        def write(f):
+            f.write(u'partial')
+            raise ValueError()
+        with self.assertRaises(ValueError):
+            write_if_changed(self.filename, self._digests(), write)
+        assert_that(self._contents(), is_(b'text'))
+        assert_that(sorted(os.listdir(self.root)),
+                    is_(['outputs.log', 'outputs.log.lock', 'page.html']))
+
+
+class TestOutputDigests(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='nti.nikola_chameleon.tests.')
+        self.path = os.path.join(self.root, 'outputs.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.root, True)
+
+    def _makeOne(self):
+        from ..outputs import OutputDigests
+        return OutputDigests(self.path)
+
+    def _lines(self):
+        with open(self.path) as f:
+            return f.readlines()
+
+    def test_compacts_and_ignores_partial_lines(self):
+        filename = os.path.join(self.root, 'page with space.html')
+        with open(filename, 'w') as f:
+            f.write('text')
+        digests = self._makeOne()
+        for i in range(150):
+            digests.set(filename, str(i))
+        with open(self.path, 'a') as f:
+            f.write('partial')
+        assert_that(self._lines(), has_length(151))
+
+        digests = self._makeOne()
+        assert_that(digests.unchanged(filename, '149'), is_(True))
+        assert_that(self._lines(), has_length(1))
+
+    @unittest.skipUnless(hasattr(os, 'fork'), "Needs fork")
+    def test_compacting_keeps_concurrent_lines(self):
+        # Each worker writes enough lines to make the others compact.
+        workers = [multiprocessing.Process(target=_set_digests,
+                                           args=(self.root, self.path, worker))
+                   for worker in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+            assert_that(worker.exitcode, is_(0))
+
+        digests = self._makeOne()
+        for worker in range(4):
+            filename = os.path.join(self.root, 'page-%d.html' % worker)
+            assert_that(digests.unchanged(filename, _last_digest(worker)), is_(True))
+
+
+_ROUNDS = 10
+_SETS = 60
+
+
+def _last_digest(worker):
+    return '%d-%d-%d' % (worker, _ROUNDS - 1, _SETS - 1)
+
+
+def _set_digests(root, path, worker):
+    from ..outputs import OutputDigests
+    filename = os.path.join(root, 'page-%d.html' % worker)
+    with open(filename, 'w') as f:
+        f.write('text')
+    for i in range(_ROUNDS):
+        # This compacts the log if there are many lines.
+        digests = OutputDigests(path)
+        for j in range(_SETS):
+            digests.set(filename, '%d-%d-%d' % (worker, i, j))
@@ -0,0 +1,773 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for plugin.py
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+
+# disable: accessing protected members, too many methods
+# pylint: disable=W0212,R0904
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from blinker import signal
+
+from hamcrest import assert_that
+from hamcrest import contains
+from hamcrest import contains_inanyorder
+from hamcrest import contains_string
+from hamcrest import greater_than
+from hamcrest import has_key
+from hamcrest import has_length
+from hamcrest import has_property
+from hamcrest import is_
+from hamcrest import is_not
+from hamcrest import is_not as does_not
+from hamcrest import none
+from hamcrest import same_instance
+
+from nikola.utils import LocaleBorg
+
+from nti.testing.matchers import provides
+
+from zope import interface
+from zope.testing.cleanup import CleanUp
+
+from .. import interfaces
+from . import MockPost
+from . import MockSite
+
+BASE_THEME_TEMPLATES = os.path.join(os.path.dirname(__file__),
+                                    'testsite', 'themes', 'base-chameleon', 'templates')
+
+
+class TestFeatured(CleanUp,
+                   unittest.TestCase):
+
+    def _makeOne(self, site):
+        from ..plugin import ChameleonTemplates
+        templates = ChameleonTemplates()
+        templates.site = site
+        return templates
+
+    def test_featured_computed_once(self):
+        featured = MockPost('featured')
+        site = MockSite([MockPost(), featured, MockPost()])
+        templates = self._makeOne(site)
+
+        result = templates.featured_posts
+        assert_that(result, contains(featured))
+        assert_that(templates.featured_posts, is_(same_instance(result)))
+        # Shared by all pages, so nothing can change it.
+        assert_that(result, is_(tuple))
+
+    def test_featured_invalidated_by_scan(self):
+        site = MockSite([MockPost()])
+        templates = self._makeOne(site)
+        signal('scanned').connect(templates._site_scanned)
+        result = templates.featured_posts
+        assert_that(result, is_(()))
+
+        # Statuses only change when the posts are scanned
+        site.posts[0].post_status = 'featured'
+        assert_that(templates.featured_posts, is_(same_instance(result)))
+
+        signal('scanned').send(site)
+        assert_that(templates.featured_posts, contains(site.posts[0]))
+
+    def test_featured_invalidated_by_new_posts(self):
+        site = MockSite([MockPost()])
+        templates = self._makeOne(site)
+        assert_that(templates.featured_posts, is_(()))
+
+        site.posts.append(MockPost('featured'))
+        assert_that(templates.featured_posts, contains(site.posts[1]))
+
+        site.posts = [MockPost('featured')]
+        assert_that(templates.featured_posts, contains(site.posts[0]))
+
+
+class _MathPost(MockPost):
+
+    def __init__(self, has_math=False):
+        MockPost.__init__(self)
+        self._has_math = has_math
+        self.checked = 0
+
+    @property
+    def has_math(self):
+        self.checked += 1
+        return self._has_math
+
+
+class TestPostsHaveMath(CleanUp,
+                        unittest.TestCase):
+
+    def setUp(self):
+        super(TestPostsHaveMath, self).setUp()
+        LocaleBorg.initialize({}, 'en')
+
+    def tearDown(self):
+        LocaleBorg.reset()
+        super(TestPostsHaveMath, self).tearDown()
+
+    def _makeOne(self, site):
+        from ..plugin import ChameleonTemplates
+        templates = ChameleonTemplates()
+        templates.site = site
+        return templates
+
+    def test_checked_once(self):
+        site = MockSite([_MathPost() for _ in range(10)] + [_MathPost(True)])
+        templates = self._makeOne(site)
+
+        assert_that(templates._posts_have_math(site.posts[:5]), is_(False))
+        assert_that(templates._posts_have_math(site.posts[5:]), is_(True))
+        assert_that(templates._posts_have_math(site.posts[::-1]), is_(True))
+        assert_that(templates._posts_have_math([]), is_(False))
+        assert_that([p.checked for p in site.posts], is_([1] * 11))
+
+    def test_per_language(self):
+        site = MockSite([_MathPost(True)])
+        templates = self._makeOne(site)
+        templates._posts_have_math(site.posts)
+        LocaleBorg().set_locale('de')
+        templates._posts_have_math(site.posts)
+        assert_that(site.posts[0].checked, is_(2))
+
+    def test_other_posts(self):
+        site = MockSite([_MathPost()])
+        templates = self._makeOne(site)
+        other = _MathPost(True)
+        assert_that(templates._posts_have_math([other]), is_(True))
+        assert_that(templates._posts_have_math([other]), is_(True))
+        assert_that(other.checked, is_(2))
+
+    def test_invalidated_by_scan(self):
+        site = MockSite([_MathPost()])
+        templates = self._makeOne(site)
+        signal('scanned').connect(templates._site_scanned)
+        assert_that(templates._posts_have_math(site.posts), is_(False))
+
+        site.posts[0]._has_math = True
+        assert_that(templates._posts_have_math(site.posts), is_(False))
+
+        signal('scanned').send(site)
+        assert_that(templates._posts_have_math(site.posts), is_(True))
+
+    def test_invalidated_by_new_posts(self):
+        site = MockSite([_MathPost()])
+        templates = self._makeOne(site)
+        assert_that(templates._posts_have_math(site.posts), is_(False))
+
+        site.posts.append(_MathPost(True))
+        assert_that(templates._posts_have_math(site.posts), is_(True))
+
+
+class TestOptionsContexts(unittest.TestCase):
+
+    def test_attributes_from_options(self):
+        from ..plugin import _GalleryContext
+        from ..plugin import _ListingContext
+        from ..plugin import _SlideContext
+        for factory, iface in ((_GalleryContext, interfaces.IGallery),
+                               (_ListingContext, interfaces.IListing),
+                               (_SlideContext, interfaces.ISlide)):
+            options = {name: object() for name in iface.names(all=True)}
+            options['other'] = 42
+            context = factory(options)
+            assert_that(context, provides(iface))
+            for name in iface.names(all=True):
+                assert_that(getattr(context, name), is_(same_instance(options[name])))
+            assert_that(context, does_not(has_property('other')))
+            assert_that(context, does_not(has_property('__dict__')))
+
+    def test_options_read_when_used(self):
+        from ..plugin import _GalleryContext
+        options = {}
+        context = _GalleryContext(options)
+        with self.assertRaises(KeyError):
+            getattr(context, 'post')
+        options['post'] = 42
+        assert_that(context.post, is_(42))
+
+
+class TestPostMarkers(CleanUp,
+                      unittest.TestCase):
+
+    def setUp(self):
+        super(TestPostMarkers, self).setUp()
+        LocaleBorg.initialize({}, 'en')
+
+    def tearDown(self):
+        LocaleBorg.reset()
+        super(TestPostMarkers, self).tearDown()
+
+    def _makeOne(self):
+        from ..plugin import ChameleonTemplates
+        return ChameleonTemplates()
+
+    def test_markers(self):
+        templates = self._makeOne()
+        post = MockPost()
+        post.has_math = True
+        post.meta['en']['nti-extra-page-kind'] = 'root'
+
+        templates._provide_post_markers(post)
+        assert_that(post, provides(interfaces.IPostPage))
+        assert_that(post, provides(interfaces.IMathJaxPost))
+        assert_that(post, provides(interfaces.IRootPage))
+
+    def test_spec_reused(self):
+        templates = self._makeOne()
+        post = MockPost()
+
+        templates._provide_post_markers(post)
+        spec = interface.providedBy(post)
+        assert_that(post, provides(interfaces.IPostPage))
+        assert_that(post, does_not(provides(interfaces.IMathJaxPost)))
+
+        # Rendering again doesn't even look at the post.
+        post.has_math = True
+        templates._provide_post_markers(post)
+        assert_that(interface.providedBy(post), is_(same_instance(spec)))
+
+        # But if something else changes what it provides, we
+        # start over.
+        interface.alsoProvides(post, interface.Interface)
+        templates._provide_post_markers(post)
+        assert_that(post, provides(interfaces.IMathJaxPost))
+
+
+class TestViewForContext(CleanUp,
+                         unittest.TestCase):
+
+    def setUp(self):
+        super(TestViewForContext, self).setUp()
+        LocaleBorg.initialize({}, 'en')
+
+    def tearDown(self):
+        LocaleBorg.reset()
+        super(TestViewForContext, self).tearDown()
+
+    def _makeOne(self):
+        from ..plugin import ChameleonTemplates
+        return ChameleonTemplates()
+
+    def _request(self, **options):
+        from ..request import Request
+        options.setdefault('site_has_comments', True)
+        options.setdefault('comment_system', 'disqus')
+        return Request(None, options)
+
+    def test_one_view_per_context_and_request(self):
+        templates = self._makeOne()
+        post = MockPost()
+        post.meta['en']['nocomments'] = False
+        request = self._request()
+
+        view = templates.view_for_context(post, request)
+        assert_that(view, provides(interfaces.ICommentKindDisqus))
+        assert_that(view, has_property('context', post))
+        assert_that(templates.view_for_context(post, request), is_(same_instance(view)))
+
+        other_post = MockPost()
+        other_post.meta['en']['nocomments'] = True
+        other_view = templates.view_for_context(other_post, request)
+        assert_that(other_view, provides(interfaces.ICommentKindNone))
+        assert_that(other_view, does_not(provides(interfaces.ICommentKindDisqus)))
+
+        assert_that(templates.view_for_context(post, self._request()),
+                    is_not(same_instance(view)))
+
+    def test_views_share_specification(self):
+        templates = self._makeOne()
+        request = self._request()
+        first = templates.new_view_for_context(object(), request)
+        second = templates.new_view_for_context(object(), request)
+        assert_that(first, provides(interfaces.ICommentKindNone))
+        assert_that(interface.providedBy(first),
+                    is_(same_instance(interface.providedBy(second))))
+
+
+class TestGetViewTemplate(CleanUp,
+                          unittest.TestCase):
+
+    def _callFUT(self, name, view, request, context):
+        from ..plugin import getViewTemplate
+        return getViewTemplate(name, view, request, context)
+
+    @property
+    def _cache(self):
+        from ..plugin import TEMPLATE_FACTORIES
+        return TEMPLATE_FACTORIES
+
+    def _register(self, result, required):
+        from z3c.template.interfaces import IContentTemplate
+        from zope import component
+        component.getGlobalSiteManager().registerAdapter(
+            lambda *args: result,
+            required=required,
+            provided=IContentTemplate,
+            name='page.tmpl')
+
+    def test_cached(self):
+        self._register('page', (interface.Interface,) * 3)
+        cache = self._cache
+        view, request, context = object(), object(), object()
+
+        hits, misses = cache.hits, cache.misses
+        assert_that(self._callFUT('page.tmpl', view, request, context), is_('page'))
+        assert_that(self._callFUT('page.tmpl', view, request, context), is_('page'))
+        assert_that(cache.misses - misses, is_(1))
+        assert_that(cache.hits - hits, is_(1))
+
+    def test_fallback_to_view_and_request(self):
+        self._register('two', (interface.Interface,) * 2)
+        assert_that(self._callFUT('page.tmpl', object(), object(), object()),
+                    is_('two'))
+
+    def test_not_found(self):
+        from zope.component import ComponentLookupError
+        with self.assertRaises(ComponentLookupError):
+            self._callFUT('page.tmpl', object(), object(), object())
+        # Misses are cached too, until the registry changes.
+        self._register('page', (interface.Interface,) * 3)
+        assert_that(self._callFUT('page.tmpl', object(), object(), object()),
+                    is_('page'))
+
+    def test_unregistered(self):
+        from z3c.template.interfaces import IContentTemplate
+        from zope import component
+        from zope.component import ComponentLookupError
+        factory = lambda *args: 'page'
+        component.provideAdapter(factory,
+                                 adapts=(interface.Interface,) * 3,
+                                 provides=IContentTemplate,
+                                 name='page.tmpl')
+        assert_that(self._callFUT('page.tmpl', object(), object(), object()),
+                    is_('page'))
+        component.getGlobalSiteManager().unregisterAdapter(
+            factory,
+            required=(interface.Interface,) * 3,
+            provided=IContentTemplate,
+            name='page.tmpl')
+        with self.assertRaises(ComponentLookupError):
+            self._callFUT('page.tmpl', object(), object(), object())
+
+    def test_cleared_by_providing_templates(self):
+        from ..plugin import ChameleonTemplates
+        self._register('page', (interface.Interface,) * 3)
+        self._callFUT('page.tmpl', object(), object(), object())
+        assert_that(self._cache, has_length(1))
+
+        templates = ChameleonTemplates()
+        templates._shortcode_paths = []
+        templates._provide_templates()
+        # Nothing to register, nothing cleared
+        assert_that(self._cache, has_length(1))
+
+        templates._template_paths = [os.path.dirname(__file__)]
+        templates._provide_templates()
+        assert_that(self._cache, has_length(0))
+
+
+class TestPrepareForWorkers(CleanUp,
+                            unittest.TestCase):
+
+    def test_prepare(self):
+        from z3c.template.interfaces import IContentTemplate
+        from zope import component
+        from ..plugin import ChameleonTemplates
+        from .. import plugin
+
+        templates = ChameleonTemplates()
+        templates._template_paths = [BASE_THEME_TEMPLATES]
+        with mock.patch.object(plugin, 'gc') as gc:
+            templates.prepare_for_workers()
+        gc.freeze.assert_called_once_with()
+        gc.unfreeze.assert_not_called()
+
+        template = component.getMultiAdapter((object(), object(), object()),
+                                             IContentTemplate,
+                                             name='post.tmpl')
+        assert_that(template, has_property('_cooked', True))
+
+    def test_prepare_again_unfreezes(self):
+        from ..plugin import ChameleonTemplates
+        from .. import plugin
+
+        templates = ChameleonTemplates()
+        templates._template_paths = [BASE_THEME_TEMPLATES]
+        with mock.patch.object(plugin, 'gc') as gc:
+            templates.prepare_for_workers()
+            templates.prepare_for_workers()
+        assert_that(gc.mock_calls,
+                    is_([mock.call.freeze(),
+                         mock.call.unfreeze(),
+                         mock.call.freeze()]))
+
+    def test_prepare_on_scan(self):
+        from ..plugin import ChameleonTemplates
+        templates = ChameleonTemplates()
+        site = MockSite()
+        site.config = {'CHAMELEON_MULTIPROCESS': True}
+        with mock.patch.object(templates, 'prepare_for_workers') as prepare:
+            templates._site_scanned(site)
+            prepare.assert_called_once_with()
+
+            site.config = {}
+            templates._site_scanned(site)
+            prepare.assert_called_once_with()
+
+
+class TestPrecompile(CleanUp,
+                     unittest.TestCase):
+
+    def setUp(self):
+        super(TestPrecompile, self).setUp()
+        from chameleon import template as template_mod
+        self._orig_loader = template_mod.BaseTemplate.loader
+        self.cache_folder = tempfile.mkdtemp(prefix='nti.nikola_chameleon.tests.')
+
+    def tearDown(self):
+        from chameleon import template as template_mod
+        template_mod.BaseTemplate.loader = self._orig_loader
+        shutil.rmtree(self.cache_folder, True)
+        super(TestPrecompile, self).tearDown()
+
+    def _makeOne(self):
+        from ..plugin import ChameleonTemplates
+        templates = ChameleonTemplates()
+        templates._shortcode_paths = []
+        templates.set_directories([BASE_THEME_TEMPLATES], self.cache_folder)
+        return templates
+
+    def _check_compiled(self, templates):
+        from z3c.template.interfaces import IContentTemplate
+        from zope import component
+        assert_that(templates._compilation, is_(none()))
+        assert_that(templates.compile_times,
+                    has_key(os.path.join(BASE_THEME_TEMPLATES, 'post.tmpl.pt')))
+        template = component.getMultiAdapter((object(), object(), object()),
+                                             IContentTemplate,
+                                             name='post.tmpl')
+        assert_that(template, has_property('_cooked', True))
+
+    def test_processes(self):
+        templates = self._makeOne()
+        templates.precompile()
+        assert_that(templates._compilation, is_not(none()))
+        templates._finish_precompile()
+        self._check_compiled(templates)
+
+    def test_failure_cancels(self):
+        from concurrent.futures import Future
+        from ..template import TemplateCompilation
+
+        class Executor(object):
+            def __init__(self):
+                self.futures = []
+
+            def submit(self, func, *args):
+                future = Future()
+                self.futures.append(future)
+                return future
+
+        templates = self._makeOne()
+        templates._provide_templates()
+        executor = Executor()
+        compilation = TemplateCompilation(executor)
+        failed = executor.futures[0]
+        failed.set_exception(SyntaxError())
+        with self.assertRaises(SyntaxError):
+            compilation.result()
+        assert_that(executor.futures[1:], has_length(greater_than(0)))
+        for future in executor.futures[1:]:
+            assert_that(future.cancelled(), is_(True))
+
+    def test_precompile_on_set_site(self):
+        templates = self._makeOne()
+        site = MockSite()
+        site.config = {'CHAMELEON_PRECOMPILE': True}
+        with mock.patch.object(templates, 'precompile') as precompile:
+            templates.set_site(site)
+        precompile.assert_called_once_with()
+
+
+class TestShortcodeDeps(CleanUp,
+                        unittest.TestCase):
+
+    def setUp(self):
+        super(TestShortcodeDeps, self).setUp()
+        self.root = tempfile.mkdtemp(prefix='nti.nikola_chameleon.tests.')
+        self.shortcode = os.path.join(self.root, 'greeting.tmpl')
+        with open(self.shortcode, 'w') as f:
+            f.write(u'<div>Hello</div>\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.root, True)
+        super(TestShortcodeDeps, self).tearDown()
+
+    def _makeOne(self):
+        from ..plugin import ChameleonTemplates
+        templates = ChameleonTemplates()
+        templates._template_paths = [BASE_THEME_TEMPLATES]
+        templates._shortcode_paths = [self.root]
+        return templates
+
+    def test_string_deps(self):
+        templates = self._makeOne()
+        theme_zcml = os.path.join(BASE_THEME_TEMPLATES, 'theme.zcml')
+        assert_that(templates.get_string_deps(u'<div>Hello</div>\n'),
+                    is_([self.shortcode, theme_zcml]))
+        assert_that(templates.get_string_deps(u'<div>Not a file</div>'),
+                    is_([]))
+
+        # What it uses when rendered is recorded by file
+        macros = os.path.join(BASE_THEME_TEMPLATES, 'base.macro.pt')
+        templates._dependencies.add(self.shortcode, {self.shortcode, macros})
+        assert_that(templates.get_string_deps(u'<div>Hello</div>\n'),
+                    is_([self.shortcode, macros, theme_zcml]))
+        # Sorted by path, and self.root may sort either side of the
+        # checkout.
+        assert_that(templates.get_deps(self.shortcode),
+                    contains_inanyorder(macros, self.shortcode, theme_zcml))
+
+    def test_deps_with_context(self):
+        # Nikola passes the context it renders the shortcode with.
+        templates = self._makeOne()
+        assert_that(templates.get_string_deps(u'<div>Hello</div>\n', {}),
+                    is_(templates.get_string_deps(u'<div>Hello</div>\n')))
+        assert_that(templates.get_deps(self.shortcode, {}),
+                    is_(templates.get_deps(self.shortcode)))
+
+    def test_template_path(self):
+        templates = self._makeOne()
+        assert_that(templates.get_template_path(u'<div>Hello</div>\n'),
+                    is_(self.shortcode))
+        assert_that(templates.get_template_path('post.tmpl'),
+                    is_(os.path.join(BASE_THEME_TEMPLATES, 'post.tmpl.pt')))
+        assert_that(templates.get_template_path('no such.tmpl'),
+                    is_(none()))
+
+    def test_template_deps_with_context(self):
+        # Nikola passes the context the template is rendered with.
+        templates = self._makeOne()
+        assert_that(templates.template_deps('post.tmpl', {}),
+                    is_(templates.template_deps('post.tmpl')))
+        assert_that(templates.template_deps('post.tmpl', {})[0],
+                    is_(os.path.join(BASE_THEME_TEMPLATES, 'post.tmpl.pt')))
+
+
+class TestRenderToFile(CleanUp,
+                       unittest.TestCase):
+
+    TEMPLATE = u"""<ul>
+  <li tal:repeat="item options/items">${item}</li>
+  <li tal:on-error="string:recovered">${options/missing}</li>
+</ul>
+"""
+
+    def setUp(self):
+        super(TestRenderToFile, self).setUp()
+        self.root = tempfile.mkdtemp(prefix='nti.nikola_chameleon.tests.')
+        with open(os.path.join(self.root, 'list.tmpl.pt'), 'w') as f:
+            f.write(self.TEMPLATE)
+        LocaleBorg.initialize({}, 'en')
+
+    def tearDown(self):
+        LocaleBorg.reset()
+        shutil.rmtree(self.root, True)
+        super(TestRenderToFile, self).tearDown()
+
+    def _makeOne(self):
+        from ..plugin import ChameleonTemplates
+        templates = ChameleonTemplates()
+        templates._template_paths = [self.root]
+        templates._shortcode_paths = []
+        templates.site = MockSite()
+        templates.site.MESSAGES = lambda msgid, lang=None: msgid
+        return templates
+
+    def _options(self):
+        # More items than are written at once.
+        return {
+            'posts': [],
+            'items': [u'Item ☃ %d' % i for i in range(1000)],
+            'lang': 'en',
+        }
+
+    def test_same_as_string(self):
+        templates = self._makeOne()
+        expected = templates.render_template_to_string('list.tmpl', self._options())
+        assert_that(expected, contains_string(u'Item ☃ 999'))
+        assert_that(expected, contains_string(u'recovered'))
+
+        output_name = os.path.join(self.root, 'output', 'list.html')
+        templates.render_template_to_file('list.tmpl', output_name, self._options())
+        with open(output_name, 'rb') as f:
+            assert_that(f.read(), is_(expected.encode('utf-8')))
+
+        result = templates.render_template('list.tmpl', output_name, self._options())
+        assert_that(result, is_(expected))
+
+    def test_unchanged_not_written(self):
+        from ..outputs import OutputDigests
+        templates = self._makeOne()
+        manifest = os.path.join(self.root, 'outputs.log')
+        templates._output_digests = OutputDigests(manifest)
+        output_name = os.path.join(self.root, 'output', 'list.html')
+        written = templates.render_template_to_file('list.tmpl', output_name, self._options())
+        assert_that(written, is_(True))
+        written = templates.render_template_to_file('list.tmpl', output_name, self._options())
+        assert_that(written, is_(False))
+        assert_that(os.path.exists(manifest), is_(True))
+
+        options = self._options()
+        options['items'] = [u'Other']
+        written = templates.render_template_to_file('list.tmpl', output_name, options)
+        assert_that(written, is_(True))
+
+    def test_template_not_changed(self):
+        from z3c.template.interfaces import IContentTemplate
+        from zope import component
+        templates = self._makeOne()
+        expected = templates.render_template_to_string('list.tmpl', self._options())
+        template = component.getMultiAdapter((object(), object(), object()),
+                                             IContentTemplate, name='list.tmpl')
+        output_name = os.path.join(self.root, 'output', 'list.html')
+        templates.render_template_to_file('list.tmpl', output_name, self._options())
+        assert_that(template.__dict__, does_not(has_key('output_stream_factory')))
+        # The stream was only for that rendering.
+        assert_that(templates.render_template_to_string('list.tmpl', self._options()),
+                    is_(expected))
+
+    def test_template_without_render_to_file(self):
+        from z3c.template.interfaces import IContentTemplate
+        from zope import component
+
+        class Template(object):
+            def __call__(self, *args, **kwargs):
+                return u'<p>%s</p>' % kwargs['lang']
+
+        component.provideAdapter(lambda view, request, context: Template(),
+                                 adapts=(interface.Interface,) * 3,
+                                 provides=IContentTemplate,
+                                 name='plain.tmpl')
+        templates = self._makeOne()
+        output_name = os.path.join(self.root, 'output', 'plain.html')
+        templates.render_template_to_file('plain.tmpl', output_name, self._options())
+        with open(output_name, 'rb') as f:
+            assert_that(f.read(), is_(b'<p>en</p>'))
+
+    def test_streaming_output(self):
+        from ..template import _StreamingOutput
+        f = io.StringIO()
+        stream = _StreamingOutput(f)
+        stream.batch_size = 2
+        stream.append(u'a')
+        stream.append(u'b')
+        stream.append(u'c')
+        assert_that(f.getvalue(), is_(u'ab'))
+        assert_that(stream, has_length(3))
+        del stream[2:]
+        assert_that(stream, has_length(2))
+        with self.assertRaises(ValueError):
+            del stream[1:]
+
+
+class _Provider(object):
+
+    def __init__(self, context, request, view):
+        pass
+
+    def update(self):
+        pass
+
+    def render(self):
+        return u'provided'
+
+
+class TestProfiling(CleanUp,
+                    unittest.TestCase):
+
+    TEMPLATE = u"""<p tal:content="structure provider:things" />"""
+
+    def setUp(self):
+        super(TestProfiling, self).setUp()
+        self.root = tempfile.mkdtemp(prefix='nti.nikola_chameleon.tests.')
+        with open(os.path.join(self.root, 'page.tmpl.pt'), 'w') as f:
+            f.write(self.TEMPLATE)
+        LocaleBorg.initialize({}, 'en')
+
+    def tearDown(self):
+        LocaleBorg.reset()
+        shutil.rmtree(self.root, True)
+        super(TestProfiling, self).tearDown()
+
+    def test_profile_render(self):
+        from zope import component
+        from zope.contentprovider.interfaces import IContentProvider
+        from ..plugin import ChameleonTemplates
+        component.provideAdapter(_Provider,
+                                 (interface.Interface, interface.Interface, interface.Interface),
+                                 IContentProvider, name='things')
+        templates = ChameleonTemplates()
+        templates._template_paths = [self.root]
+        templates._shortcode_paths = []
+        templates._cache_folder = os.path.join(self.root, 'cache')
+        templates.site = MockSite()
+        templates.site.MESSAGES = lambda msgid, lang=None: msgid
+
+        templates.start_profiling()
+        for _ in range(2):
+            result = templates.render_template_to_string('page.tmpl',
+                                                         {'posts': [], 'lang': 'en'})
+            assert_that(result, is_(u'<p>provided</p>'))
+        profile = templates.stop_profiling()
+
+        entries = {(e[0], e[1]): e[2:] for e in profile.sorted_entries()}
+        assert_that(entries, has_length(3))
+        calls, total, own = entries[('render', 'page.tmpl')]
+        assert_that(calls, is_(2))
+        assert_that(total >= own, is_(True))
+        template_calls = entries[('template', os.path.join(self.root, 'page.tmpl.pt'))][0]
+        assert_that(template_calls, is_(2))
+        assert_that(entries[('provider', 'things')][0], is_(2))
+
+        with open(os.path.join(self.root, 'cache', 'chameleon_profile.txt')) as f:
+            assert_that(f.read(), contains_string('provider'))
+        with open(os.path.join(self.root, 'cache', 'chameleon_profile.json')) as f:
+            assert_that(json.load(f), has_length(3))
+
+        # Nothing more is recorded.
+        templates.render_template_to_string('page.tmpl', {'posts': [], 'lang': 'en'})
+        assert_that(profile.entries[('render', 'page.tmpl')][0], is_(2))
+
+    def test_bound_macro(self):
+        from .. import profiling
+        from ..macro import BoundMacro
+
+        class Macro(object):
+            def include(self, stream, econtext):
+                stream.append(econtext['context'])
+
+        macro = BoundMacro(u'context', Macro(), 'a_macro')
+        stream = []
+        profile = profiling.start()
+        macro.include(stream, {})
+        profiling.stop()
+        macro.include(stream, {})
+        assert_that(stream, is_([u'context', u'context']))
+        assert_that(profile.entries, has_key(('macro', 'a_macro')))
+        assert_that(profile.entries[('macro', 'a_macro')][0], is_(1))
@@ -120,3 +120,15 @@ class TestRender(unittest.TestCase):
         self.layer.assertOutputExists('posts', 'test-page.html')
         self.layer.assertInOutput("<div>This came from a shortcode</div>",
                                   'posts', 'test-page.html')
+
+    def test_dependencies_recorded(self):
+        from ..dependencies import DependencyGraph
+        self.layer.assertOutputExists('posts', 'test-page.html')
+        graph = DependencyGraph(os.path.join(self.layer.testsite, 'cache', 'chameleon_deps.json'))
+        theme = os.path.join(self.layer.testsite, 'themes', 'base-chameleon', 'templates')
+        deps = graph.get('post.tmpl')
+        # The template itself, the template traversed to for its macro,
+        # a macro file and a viewlet
+        for name in ('post.tmpl.pt', 'base.tmpl.pt', 'post_header.macro.pt',
+                     'v_post_extra_head.pt'):
+            self.assertIn(os.path.join(theme, name), deps)
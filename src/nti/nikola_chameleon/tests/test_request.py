@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for request.py
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+
+# disable: accessing protected members, too many methods
+# pylint: disable=W0212,R0904
+
+import unittest
+
+from hamcrest import assert_that
+from hamcrest import contains_inanyorder
+from hamcrest import has_length
+from hamcrest import is_
+from hamcrest import none
+from hamcrest import same_instance
+
+from nti.testing.matchers import provides
+
+from zope import interface
+
+from .. import interfaces
+
+
+class TestRequestFactory(unittest.TestCase):
+
+    def _callFUT(self, pagekind, template):
+        from ..request import request_factory
+        return request_factory(frozenset(pagekind), template)
+
+    def test_layers(self):
+        request = self._callFUT(('post_page',), 'post.tmpl')(None, {})
+        assert_that(request, provides(interfaces.IPostPageKind))
+
+        request = self._callFUT(('page_page', 'story_page'), 'book.tmpl')(None, {})
+        assert_that(request, provides(interfaces.IStoryPageKind))
+        assert_that(request, provides(interfaces.IBookPageKind))
+
+    def test_spec_shared(self):
+        request1 = self._callFUT(('index',), 'index.tmpl')(None, {})
+        request2 = self._callFUT(('index',), 'index.tmpl')(None, {})
+        assert_that(interface.providedBy(request1),
+                    is_(same_instance(interface.providedBy(request2))))
+
+    def test_same_resolution_as_also_provides(self):
+        from ..request import Request
+        for pagekind, layer in interfaces.PAGEKINDS.items():
+            for template in ('index.tmpl', 'book.tmpl'):
+                expected = Request(None, {})
+                interface.alsoProvides(expected, layer)
+                if template == 'book.tmpl':
+                    interface.alsoProvides(expected, interfaces.IBookPageKind)
+
+                request = self._callFUT(pagekind, template)(None, {})
+                assert_that(interface.providedBy(request).__iro__,
+                            is_(interface.providedBy(expected).__iro__))
+
+    def test_unknown_pagekind(self):
+        with self.assertRaises(KeyError):
+            self._callFUT(('no such kind',), 'index.tmpl')
+
+
+class TestLayeredOptions(unittest.TestCase):
+
+    def _makeOne(self, base, **kwargs):
+        from ..request import LayeredOptions
+        return LayeredOptions(base, **kwargs)
+
+    def test_reads_through(self):
+        base = {'a': 1, 'b': 2}
+        options = self._makeOne(base, b=3, c=4)
+        assert_that(options['a'], is_(1))
+        assert_that(options['b'], is_(3))
+        assert_that(options.get('a'), is_(1))
+        assert_that(options.get('b'), is_(3))
+        assert_that(options.get('d', 5), is_(5))
+        assert_that('a' in options, is_(True))
+        assert_that('d' in options, is_(False))
+        with self.assertRaises(KeyError):
+            options['d'] # pylint:disable=pointless-statement
+
+    def test_acts_merged(self):
+        base = {'a': 1, 'b': 2}
+        options = self._makeOne(base, b=3, c=4)
+        merged = {'a': 1, 'b': 3, 'c': 4}
+        assert_that(options, is_(merged))
+        assert_that(dict(options), is_(merged))
+        assert_that(dict(**options), is_(merged))
+        assert_that(sorted(options), is_(['a', 'b', 'c']))
+        assert_that(options, has_length(3))
+
+    def test_copy_on_write(self):
+        base = {'a': 1}
+        options = self._makeOne(base)
+        options['a'] = 2
+        assert_that(options.setdefault('a', 3), is_(2))
+        assert_that(options.setdefault('b', 3), is_(3))
+        assert_that(options, is_({'a': 2, 'b': 3}))
+        assert_that(base, is_({'a': 1}))
+
+    def test_views_dont_copy(self):
+        class Base(dict):
+            def copy(self):
+                raise AssertionError("Copied")
+            keys = values = items = copy
+
+        base = Base(a=1, b=2)
+        options = self._makeOne(base, b=3, c=4)
+        assert_that(list(options), contains_inanyorder('a', 'b', 'c'))
+        assert_that(options, has_length(3))
+        assert_that(options.keys(), contains_inanyorder('a', 'b', 'c'))
+        assert_that(options.values(), contains_inanyorder(1, 3, 4))
+        assert_that(options.items(), contains_inanyorder(('a', 1), ('b', 3), ('c', 4)))
+        assert_that('c' in options.keys(), is_(True))
+
+    def test_remove_own_items_only(self):
+        base = {'a': 1, 'b': 2}
+        options = self._makeOne(base, b=3, c=4)
+        assert_that(options.pop('b'), is_(3))
+        assert_that(options['b'], is_(2))
+        del options['c']
+        assert_that('c' in options, is_(False))
+        with self.assertRaises(KeyError):
+            del options['a']
+        assert_that(options.pop('a', None), is_(none()))
+        assert_that(options, is_(base))
+        assert_that(base, is_({'a': 1, 'b': 2}))
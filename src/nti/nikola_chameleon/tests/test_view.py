@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for view.py
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+
+# disable: accessing protected members, too many methods
+# pylint: disable=W0212,R0904
+
+import unittest
+from unittest import mock
+
+from hamcrest import assert_that
+from hamcrest import has_length
+from hamcrest import is_
+from hamcrest import none
+
+from nikola.utils import LocaleBorg
+
+from zope import interface
+from zope.testing.cleanup import CleanUp
+
+from .. import interfaces
+from .. import view
+from ..request import REQUEST_LAYERS
+from ..request import Request
+from ..view import PAGEKIND_CSS_CLASSES
+from ..view import PostCssKindView
+from ..view import PostTextView
+from ..view import TextCache
+from . import MockView
+
+
+class TestPostCssKindView(CleanUp,
+                          unittest.TestCase):
+
+    def _pagekind_class(self, request):
+        return PostCssKindView(None, request).pagekind_class
+
+    def _scanned(self, request):
+        # What we used to do each time.
+        for p in list(interface.providedBy(request).flattened()):
+            if p.isOrExtends(interfaces.IPageKind):
+                return p.__name__[1:-4].lower()
+        return None
+
+    def test_request_layers(self):
+        for cls in REQUEST_LAYERS.values():
+            request = cls(None, {})
+            assert_that(interface.providedBy(request) in PAGEKIND_CSS_CLASSES,
+                        is_(True))
+            assert_that(self._pagekind_class(request), is_(self._scanned(request)))
+
+        request = REQUEST_LAYERS[(frozenset(['list', 'tag_page']), None)](None, {})
+        assert_that(self._pagekind_class(request), is_('tagpage'))
+
+    def test_provided_by_request(self):
+        request = Request(None, {})
+        assert_that(self._pagekind_class(request), is_(none()))
+
+        interface.alsoProvides(request, interfaces.ITagPageKind)
+        assert_that(self._pagekind_class(request), is_('tagpage'))
+        # One-off specifications aren't kept.
+        assert_that(interface.providedBy(request) in PAGEKIND_CSS_CLASSES,
+                    is_(False))
+
+
+class _Post(object):
+
+    def __init__(self):
+        self.texts = []
+
+    def text(self, lang=None, teaser_only=False, strip_html=False):
+        self.texts.append((lang, teaser_only, strip_html))
+        return u'%s %s %s' % (lang, teaser_only, strip_html)
+
+
+class TestTextCache(unittest.TestCase):
+
+    def test_cached(self):
+        cache = TextCache()
+        post = _Post()
+        text = cache.get(post, 'en', True, False)
+        assert_that(cache.get(post, 'en', True, False), is_(text))
+        cache.get(post, 'en', True, True)
+        cache.get(post, 'de', True, True)
+        assert_that(post.texts, is_([('en', True, False),
+                                     ('en', True, True),
+                                     ('de', True, True)]))
+        assert_that(cache.hits, is_(1))
+        assert_that(cache.misses, is_(3))
+        assert_that(cache, has_length(3))
+
+        cache.clear()
+        assert_that(cache, has_length(0))
+        assert_that(cache.size, is_(0))
+
+    def test_size_bounded(self):
+        posts = [_Post() for _ in range(4)]
+        cache = TextCache()
+        cache.get(_Post(), 'en', True, False)
+        size = cache.size
+        assert_that(size >= len(u'en True False'), is_(True))
+        cache = TextCache(max_size=size * 3)
+        for post in posts[:3]:
+            cache.get(post, 'en', True, False)
+        assert_that(cache.size, is_(size * 3))
+        # Used most recently
+        cache.get(posts[0], 'en', True, False)
+
+        cache.get(posts[3], 'en', True, False)
+        assert_that(cache, has_length(3))
+        assert_that(cache.size, is_(size * 3))
+        assert_that([(post, 'en', True, False) in cache._texts for post in posts],
+                    is_([True, False, True, True]))
+
+    def test_size_without_getsizeof(self):
+        # Like PyPy
+        def getsizeof(obj, default=None):
+            if default is None:
+                raise TypeError(obj)
+            return default
+
+        cache = TextCache()
+        with mock.patch.object(view.sys, 'getsizeof', getsizeof):
+            cache.get(_Post(), 'en', True, False)
+        assert_that(cache.size, is_(len(u'en True False')))
+
+    def test_too_large(self):
+        cache = TextCache(max_size=1)
+        post = _Post()
+        cache.get(post, 'en', True, False)
+        cache.get(post, 'en', True, False)
+        assert_that(post.texts, has_length(2))
+        assert_that(cache.size, is_(0))
+
+
+class TestPostTextView(unittest.TestCase):
+
+    def setUp(self):
+        LocaleBorg.initialize({}, 'en')
+
+    def tearDown(self):
+        LocaleBorg.reset()
+
+    def test_text_cached(self):
+        post = _Post()
+        request = Request(None, {'view': MockView(), 'index_teasers': True})
+        for _ in range(2):
+            view = PostTextView(post, request)
+            assert_that(view.content, is_(u'en True False'))
+            assert_that(view.embedded_content, is_(u'en True True'))
+        assert_that(post.texts, is_([('en', True, False), ('en', True, True)]))
+
+    def test_without_templates(self):
+        post = _Post()
+        view = PostTextView(post, Request(None, {'index_teasers': False}))
+        view.content # pylint:disable=pointless-statement
+        view.content # pylint:disable=pointless-statement
+        assert_that(post.texts, is_([(None, False, False)] * 2))
@@ -13,11 +13,17 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+from collections import OrderedDict
+import sys
+
+from nikola.utils import LocaleBorg
+
 from zope import interface
 from zope.publisher.interfaces.browser import IBrowserView
 from zope.viewlet.manager import ConditionalViewletManager as ZConditionalViewletManager
 
 from . import interfaces
+from .request import REQUEST_LAYERS
 
 @interface.implementer(IBrowserView)
 class BaseView(object):
@@ -49,6 +55,100 @@ class View(BaseView):
         BaseView.__init__(self, context, request)
         self.templates = templates
 
+
+#: A map from a comment kind interface (such as
+#: :class:`~.ICommentKindNone`) to a subclass of :class:`View` that
+#: implements it. Like the request classes in
+#: :data:`.request.REQUEST_LAYERS`, all the views of one comment kind
+#: share one specification and its adapter lookup caches.
+VIEW_COMMENT_KINDS = {}
+
+
+def view_factory(comment_kind):
+    """
+    Return the :class:`View` class that provides *comment_kind*.
+
+    .. versionadded:: 1.0.1
+    """
+    try:
+        return VIEW_COMMENT_KINDS[comment_kind]
+    except KeyError:
+        name = 'View_' + comment_kind.__name__
+        cls = type(str(name), (View,), {'__module__': __name__})
+        interface.classImplements(cls, comment_kind)
+        return VIEW_COMMENT_KINDS.setdefault(comment_kind, cls)
+
+
+#: The default maximum size, in bytes, of a :class:`TextCache`.
+DEFAULT_TEXT_CACHE_MAX_SIZE = 32 * 1024 * 1024
+
+
+def _text_size(text):
+    # Implementations without a meaningful size (PyPy) give the
+    # default: the number of characters.
+    return sys.getsizeof(text, len(text))
+
+
+class TextCache(object):
+    """
+    The text of posts, as used by :class:`PostTextView`, keyed by the
+    post, the language and the arguments given to ``post.text``.
+
+    The text is kept until the cache is :meth:`cleared <clear>`
+    (which :class:`~.ChameleonTemplates` does each time the site is
+    scanned), or until more than *max_size* bytes of text are kept,
+    when the text used least recently is discarded. (Where the
+    interpreter can't tell how many bytes a string uses, as on PyPy,
+    each character counts as one byte.)
+
+    .. versionadded:: 1.0.1
+    """
+
+    def __init__(self, max_size=DEFAULT_TEXT_CACHE_MAX_SIZE):
+        self.max_size = max_size
+        #: The number of bytes used by the text kept.
+        self.size = 0
+        #: The number of times text was found in the cache.
+        self.hits = 0
+        #: The number of times text had to be produced.
+        self.misses = 0
+        self._texts = OrderedDict()
+
+    def clear(self):
+        self._texts.clear()
+        self.size = 0
+
+    def __len__(self):
+        return len(self._texts)
+
+    def get(self, post, lang, teaser_only, strip_html):
+        """
+        Return ``post.text(lang, teaser_only, strip_html)``, from the
+        cache if possible.
+        """
+        key = (post, lang, teaser_only, strip_html)
+        texts = self._texts
+        try:
+            text = texts[key]
+        except KeyError:
+            pass
+        else:
+            self.hits += 1
+            texts.move_to_end(key)
+            return text
+
+        self.misses += 1
+        text = post.text(lang, teaser_only=teaser_only, strip_html=strip_html)
+        size = _text_size(text)
+        if size <= self.max_size:
+            texts[key] = text
+            self.size += size
+            while self.size > self.max_size:
+                _, old = texts.popitem(last=False)
+                self.size -= _text_size(old)
+        return text
+
+
 class PostTextView(BaseView):
     """
     For getting the text of a post, while respecting teasers.
@@ -79,7 +179,7 @@ class PostTextView(BaseView):
         The full text or teaser text of the post, as appropriate, in
         an index.
         """
-        return self.context.text(teaser_only=bool(self.teaser))
+        return self._text(teaser_only=bool(self.teaser))
 
     @property
     def preview(self):
@@ -94,7 +194,32 @@ class PostTextView(BaseView):
         The teaser for a post, stripped of html. Works regardless of index
         status.
         """
-        return self.context.text(teaser_only=True, strip_html=True)
+        return self._text(teaser_only=True, strip_html=True)
+
+    def _text(self, teaser_only, strip_html=False):
+        # The text of the post in the current language, kept by the
+        # TextCache of the ChameleonTemplates rendering, if any.
+        view = self.request.options.get('view')
+        texts = getattr(getattr(view, 'templates', None), 'post_texts', None)
+        if texts is None:
+            return self.context.text(teaser_only=teaser_only, strip_html=strip_html)
+        return texts.get(self.context, LocaleBorg().current_lang, teaser_only, strip_html)
+
+#: A map from the specification of a request (what it provides) to
+#: the CSS class of its page kind; see
+#: :attr:`PostCssKindView.pagekind_class`. This has only the request
+#: classes of :data:`.request.REQUEST_LAYERS`; the class for any other
+#: specification (such as one made by ``alsoProvides`` on a single
+#: request) is computed each time and not stored.
+PAGEKIND_CSS_CLASSES = {}
+
+
+def _pagekind_css_class(spec):
+    for p in spec.flattened():
+        if p.isOrExtends(interfaces.IPageKind):
+            return p.__name__[1:-4].lower()
+    return None
+
 
 class PostCssKindView(BaseView):
     """
@@ -108,15 +233,31 @@ class PostCssKindView(BaseView):
         """
         Returns a class name suitable for use in CSS.
         """
-        layer = self.request
-        providing = list(interface.providedBy(layer).flattened())
-        for p in providing:
-            if p.isOrExtends(interfaces.IPageKind):
-                name = p.__name__[1:-4].lower()
-                return name
+        spec = interface.providedBy(self.request)
+        try:
+            return PAGEKIND_CSS_CLASSES[spec]
+        except KeyError:
+            return _pagekind_css_class(spec)
 
 class ConditionalViewletManager(ZConditionalViewletManager):
     """
     A viewlet manager that respects the ``weight`` and ``available``
     attributes.
     """
+
+
+def _cleanUp():
+    PAGEKIND_CSS_CLASSES.clear()
+    for cls in REQUEST_LAYERS.values():
+        spec = interface.implementedBy(cls)
+        PAGEKIND_CSS_CLASSES[spec] = _pagekind_css_class(spec)
+
+_cleanUp()
+
+try:
+    from zope.testing import cleanup
+except ImportError: # pragma: no cover
+    pass
+else:
+    cleanup.addCleanUp(VIEW_COMMENT_KINDS.clear)
+    cleanup.addCleanUp(_cleanUp)